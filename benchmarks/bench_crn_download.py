@@ -0,0 +1,61 @@
+"""
+Benchmark cold-cache `get_crn` downloads against a local stand-in for the NCEI server,
+comparing serial fetching to the thread pool.
+
+    python benchmarks/bench_crn_download.py --stations 100 --latency 0.05
+"""
+import argparse
+import shutil
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import pandas as pd
+from bench_suite import clear_memory
+from standin import quiet, serve, write_crn_tree
+
+from swampy import load
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stations", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore", FutureWarning)  # pandas `read_csv` deprecations
+
+    year = 2020
+    days = pd.date_range(f"{year}-06-01", periods=2)
+
+    tmp = Path(tempfile.mkdtemp(prefix="swampy-bench-"))
+    try:
+        root = tmp / "server"
+        write_crn_tree(root, [year], args.stations)
+        server = serve(root, args.latency)
+        load.CRN_BASE_URL = f"http://127.0.0.1:{server.server_port}"
+
+        res = {}
+        for n in args.workers:
+            load.CACHE_DIR = tmp / f"cache-{n}"  # cold cache
+            load.CACHE_DIR.mkdir()
+            clear_memory()
+            tic = time.perf_counter()
+            with quiet():
+                df = load.get_crn(days, max_workers=n)
+            res[n] = time.perf_counter() - tic
+            assert df.WBANNO.nunique() == args.stations
+
+        server.shutdown()
+    finally:
+        shutil.rmtree(tmp)
+
+    print(f"{args.stations} station files, {args.latency * 1000:.0f} ms simulated latency")
+    for n, t in res.items():
+        print(f"max_workers={n:<3d} {t:6.2f} s  ({res[args.workers[0]] / t:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark `import swampy` in a fresh interpreter,
+checking that it doesn't load the coefficients (`C`), which should happen on first access,
+and failing if the (median) import time exceeds `--max-seconds`.
+
+    python benchmarks/bench_import.py --max-seconds 3
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+CODE = """\
+import time
+tic = time.perf_counter()
+import swampy
+t_import = time.perf_counter() - tic
+
+from swampy import calc
+assert calc._read_coeffs.cache_info().currsize == 0, "coefficients loaded at import"
+
+tic = time.perf_counter()
+swampy.C
+t_c = time.perf_counter() - tic
+print(t_import, t_c)
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=5, help="number of interpreters to time")
+    parser.add_argument("--max-seconds", type=float, default=None, help="import time limit")
+    args = parser.parse_args(argv)
+
+    t_import, t_c = [], []
+    for _ in range(args.n):
+        out = subprocess.run(
+            [sys.executable, "-c", CODE], check=True, capture_output=True, text=True
+        ).stdout
+        a, b = map(float, out.split())
+        t_import.append(a)
+        t_c.append(b)
+
+    # The first `C` access may have had to parse the text files and write the binary cache
+    print(f"import swampy        {statistics.median(t_import):6.3f} s (median of {args.n})")
+    print(f"first access of `C`  {statistics.median(t_c):6.3f} s (first: {t_c[0]:.3f} s)")
+
+    if args.max_seconds is not None and statistics.median(t_import) > args.max_seconds:
+        print(f"import time exceeds {args.max_seconds} s")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark the SWAMP time-stepping on the full grid,
+comparing the xarray label-indexing loop `run` used to have with the in-place kernel.
+
+    python benchmarks/bench_run_kernel.py --days 365
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from swampy.calc import _NLAT, _NLON, GRID, _integrate
+
+
+def xarray_loop(ds, p_minus_et, c1, d):
+    """The loop from `run` before the kernel (see git history)."""
+    days = ds.time.values
+    for i in range(1, ds.sizes["time"]):
+        delta_mm_no_coeff = p_minus_et.isel(time=i)
+        delta_mm = c1 * delta_mm_no_coeff
+        ds["sm"].loc[dict(time=days[i])] = np.clip(
+            (d * ds.sm.isel(time=i - 1) + delta_mm) / d,
+            0,
+            1,
+        )
+        ds["smn"].loc[dict(time=days[i])] = np.clip(
+            (d * ds.smn.isel(time=i - 1) + delta_mm_no_coeff) / d,
+            0,
+            1,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--skip-xarray", action="store_true", help="only time the kernel")
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1], help="kernel thread counts (tiles)"
+    )
+    args = parser.parse_args(argv)
+
+    ntime = args.days
+    d = 250
+    rng = np.random.default_rng(0)
+    days = pd.date_range("2022-01-01", periods=ntime)
+
+    # Cycle through a week of synthetic P - ET to limit memory use
+    nsample = min(ntime, 7)
+    sample = rng.normal(0, 5, (nsample, _NLAT, _NLON))
+    p_minus_et = sample[np.arange(ntime) % nsample]
+    c1 = np.where(rng.random((_NLAT, _NLON)) < 0.4, np.nan, rng.random((_NLAT, _NLON)))
+    ic = rng.random((_NLAT, _NLON))
+
+    res = {}
+
+    sm = np.empty((ntime, _NLAT, _NLON))
+    smn = np.empty((ntime, _NLAT, _NLON))
+    sm[0] = smn[0] = ic
+    for n in args.workers:
+        tic = time.perf_counter()
+        _integrate(sm, smn, p_minus_et[1:], c1=c1, d=d, n_workers=n)
+        res[f"kernel (n_workers={n})"] = time.perf_counter() - tic
+        if n == args.workers[0]:
+            sm_ref, smn_ref = sm.copy(), smn.copy()
+        else:
+            assert np.array_equal(sm, sm_ref, equal_nan=True)
+            assert np.array_equal(smn, smn_ref, equal_nan=True)
+
+    if not args.skip_xarray:
+        dims = ("time", "lat", "lon")
+        ds = GRID.copy()
+        ds["sm"] = (dims, np.empty((ntime, _NLAT, _NLON)))
+        ds["smn"] = (dims, np.empty((ntime, _NLAT, _NLON)))
+        ds["time"] = days
+        ds["sm"].loc[dict(time=days[0])] = ic
+        ds["smn"].loc[dict(time=days[0])] = ic
+        da = xr.DataArray(p_minus_et, dims=dims, coords=ds.coords)
+        tic = time.perf_counter()
+        xarray_loop(ds, da, xr.DataArray(c1, dims=dims[1:], coords=GRID.coords), d)
+        res["xarray"] = time.perf_counter() - tic
+
+        assert np.array_equal(ds.sm.values, sm, equal_nan=True)
+        assert np.array_equal(ds.smn.values, smn, equal_nan=True)
+
+    print(f"{ntime} days on the {_NLAT}x{_NLON} grid")
+    for k, t in res.items():
+        print(f"{k:22s} {t:7.2f} s total, {t / (ntime - 1) * 1000:6.1f} ms per day")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark cold-cache `run` end-to-end latency with and without the input prefetch pipeline,
+using synthetic PRISM and ALEXI loaders with simulated per-day fetch + decode times.
+
+    python benchmarks/bench_run_prefetch.py --days 28 --prism-delay 0.3 --alexi-delay 0.2
+"""
+import argparse
+import shutil
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from swampy import calc, load
+
+
+def fake_loaders(prism_delay, alexi_delay):
+    """Loaders returning random data on the PRISM and ALEXI grids after sleeping per day."""
+    p_lon = load._PRISM_ULXMAP + np.arange(load._PRISM_NCOLS) * load._PRISM_XDIM
+    p_lat = load._PRISM_ULYMAP - np.arange(load._PRISM_NROWS) * load._PRISM_YDIM
+    a_lat = load._ALEXI_LLLAT + np.arange(load._ALEXI_NLAT) * load._ALEXI_DLAT
+    a_lon = load._ALEXI_LLLON + np.arange(load._ALEXI_NLON) * load._ALEXI_DLON
+
+    def get_prism(days, **kwargs):
+        days = pd.DatetimeIndex(days)
+        time.sleep(prism_delay * len(days))
+        data = np.stack(
+            [
+                np.random.default_rng(d.dayofyear).gamma(0.3, 8, (p_lat.size, p_lon.size))
+                for d in days
+            ]
+        ).astype(np.float32)
+        return xr.Dataset(
+            {"ppt": (("time", "lat", "lon"), data)},
+            coords={"time": days, "lat": p_lat, "lon": p_lon},
+        )
+
+    def get_alexi(days, **kwargs):
+        days = pd.DatetimeIndex(days)
+        time.sleep(alexi_delay * len(days))
+        data = np.stack(
+            [
+                np.random.default_rng(1000 + d.dayofyear).uniform(0, 5, (a_lat.size, a_lon.size))
+                for d in days
+            ]
+        ).astype(np.float32)
+        return xr.Dataset(
+            {"et": (("time", "lat", "lon"), data)},
+            coords={"time": days, "lat": a_lat, "lon": a_lon},
+        )
+
+    return get_prism, get_alexi
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument("--prism-delay", type=float, default=0.3, help="seconds per day")
+    parser.add_argument("--alexi-delay", type=float, default=0.2, help="seconds per day")
+    parser.add_argument("--chunk-days", type=int, default=7)
+    parser.add_argument("--prefetch", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+
+    load.get_prism, load.get_alexi = fake_loaders(args.prism_delay, args.alexi_delay)
+    tmp = Path(tempfile.mkdtemp(prefix="swampy-bench-"))
+    load.CACHE_DIR = tmp  # (regrid weights)
+    start = pd.Timestamp("2022-06-01")
+    end = start + pd.Timedelta(days=args.days)
+    try:
+        calc.run(start, start + pd.Timedelta(days=1), quiet=True)  # weights, coefficients
+
+        res = {}
+        for prefetch in [0, args.prefetch]:
+            tic = time.perf_counter()
+            ds = calc.run(start, end, prefetch=prefetch, chunk_days=args.chunk_days, quiet=True)
+            res[prefetch] = time.perf_counter() - tic
+            if prefetch == 0:
+                sm_ref = ds.sm.values
+            else:
+                assert np.array_equal(ds.sm.values, sm_ref, equal_nan=True)
+    finally:
+        shutil.rmtree(tmp)
+
+    print(
+        f"{args.days} days, simulated load time per day: "
+        f"PRISM {args.prism_delay} s, ALEXI {args.alexi_delay} s"
+    )
+    for prefetch, t in res.items():
+        print(f"prefetch={prefetch}  {t:6.2f} s  ({res[0] / t:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
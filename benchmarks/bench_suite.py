@@ -0,0 +1,149 @@
+"""
+Benchmark loading (`get_crn`, `get_prism`, `get_alexi`), regridding and `run`
+over several date-range sizes, with cold, disk-only and in-memory caches,
+against a local stand-in for the data servers (see `standin.py`).
+
+    python benchmarks/bench_suite.py --sizes 1 7 30 --latency 0.02 --out bench.json
+
+With `--out`, the results are also written as JSON (``-`` for stdout),
+for tracking regressions across commits.
+"""
+import argparse
+import datetime
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from standin import quiet, standin_server
+
+from swampy import calc, interp, load, regrid
+
+CACHES = ("cold", "disk", "memory")
+"""
+- cold: empty cache directory and in-memory caches
+- disk: cache directory populated, in-memory caches cleared
+- memory: everything cached
+"""
+
+
+def clear_memory():
+    """Clear the in-process caches (loaded data, CRN headers, regrid weights, interpolators)."""
+    load.MEMORY_CACHE.clear()
+    load._CRN_HEADERS.clear()
+    regrid._WEIGHTS.clear()
+    interp._INTERPOLATORS.clear()
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 7, 30], help="numbers of days")
+    parser.add_argument("--start", default="2021-06-01")
+    parser.add_argument("--stations", type=int, default=100, help="number of CRN stations")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--repeat", type=int, default=1, help="timings per case (min reported)")
+    parser.add_argument("--n-workers", type=int, default=None, help="for regridding and `run`")
+    parser.add_argument("--out", default=None, help="JSON output file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+
+    start = pd.Timestamp(args.start)
+    all_days = pd.date_range(start, periods=max(args.sizes) + 1)
+
+    tmp = Path(tempfile.mkdtemp(prefix="swampy-bench-"))
+    cache_dir = load.CACHE_DIR
+    results = []
+
+    def measure(case, n, func):
+        for cache in CACHES:
+            ts = []
+            for _ in range(args.repeat):
+                if cache == "cold":
+                    load.CACHE_DIR = Path(tempfile.mkdtemp(dir=tmp, prefix="cache-"))
+                    clear_memory()
+                elif cache == "disk":
+                    clear_memory()
+                tic = time.perf_counter()
+                with quiet():
+                    func()
+                ts.append(time.perf_counter() - tic)
+            results.append({"case": case, "days": n, "cache": cache, "seconds": min(ts), "all": ts})
+            print(f"{case:<10s} {n:4d} days  {cache:<6s}  {min(ts):8.3f} s", file=sys.stderr)
+
+    try:
+        print("writing stand-in data...", file=sys.stderr)
+        with standin_server(tmp / "server", all_days, nstation=args.stations, latency=args.latency):
+            calc._get_grid()
+            calc._get_coeffs_ds()  # (not part of the timings)
+
+            for n in args.sizes:
+                days = all_days[:n]
+                measure("get_crn", n, lambda: load.get_crn(days))
+                measure("get_prism", n, lambda: load.get_prism(days))
+                measure("get_alexi", n, lambda: load.get_alexi(days))
+
+                with quiet():
+                    p = load.get_prism(days).ppt
+                    et = load.get_alexi(days).et
+                measure("regrid", n, lambda: calc._p_minus_et(p, et, n_workers=args.n_workers))
+
+                end = start + pd.Timedelta(days=n)
+                measure(
+                    "run",
+                    n,
+                    lambda: calc.run(start, end, ic="crn", n_workers=args.n_workers, quiet=True),
+                )
+    finally:
+        load.CACHE_DIR = cache_dir
+        shutil.rmtree(tmp)
+
+    file = sys.stderr if args.out == "-" else sys.stdout
+    print(file=file)
+    print(f"{'':<10s} {'days':>4s}  " + "  ".join(f"{c:>8s}" for c in CACHES), file=file)
+    table = pd.DataFrame(results).pivot_table(
+        index=["case", "days"], columns="cache", values="seconds", sort=False
+    )
+    for (case, n), row in table.iterrows():
+        print(f"{case:<10s} {n:4d}  " + "  ".join(f"{row[c]:8.3f}" for c in CACHES), file=file)
+
+    if args.out is not None:
+        doc = {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "args": vars(args),
+            "results": results,
+        }
+        if args.out == "-":
+            json.dump(doc, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.out, "w") as f:
+                json.dump(doc, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Local stand-in for the CRN (NCEI), PRISM and ALEXI (NSSTC) data servers,
+serving synthetic files in the formats of the real ones,
+with directory pages that match the loaders' listing patterns.
+
+    from standin import standin_server
+
+    with standin_server(tmp / "server", days, nstation=100):
+        swampy.load.get_crn(days)  # etc.
+"""
+import contextlib
+import functools
+import io
+import threading
+import time
+import zipfile
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from swampy import load
+
+# From https://www.ncei.noaa.gov/pub/data/uscrn/products/daily01/headers.txt
+HEADER_COLUMNS = [
+    "WBANNO",
+    "LST_DATE",
+    "CRX_VN",
+    "LONGITUDE",
+    "LATITUDE",
+    "T_DAILY_MAX",
+    "T_DAILY_MIN",
+    "T_DAILY_MEAN",
+    "T_DAILY_AVG",
+    "P_DAILY_CALC",
+    "SOLARAD_DAILY",
+    "SUR_TEMP_DAILY_TYPE",
+    "SUR_TEMP_DAILY_MAX",
+    "SUR_TEMP_DAILY_MIN",
+    "SUR_TEMP_DAILY_AVG",
+    "RH_DAILY_MAX",
+    "RH_DAILY_MIN",
+    "RH_DAILY_AVG",
+    "SOIL_MOISTURE_5_DAILY",
+    "SOIL_MOISTURE_10_DAILY",
+    "SOIL_MOISTURE_20_DAILY",
+    "SOIL_MOISTURE_50_DAILY",
+    "SOIL_MOISTURE_100_DAILY",
+    "SOIL_TEMP_5_DAILY",
+    "SOIL_TEMP_10_DAILY",
+    "SOIL_TEMP_20_DAILY",
+    "SOIL_TEMP_50_DAILY",
+    "SOIL_TEMP_100_DAILY",
+]
+
+PRISM_HDR = f"""\
+BYTEORDER      I
+LAYOUT         BIL
+NROWS          {load._PRISM_NROWS}
+NCOLS          {load._PRISM_NCOLS}
+NBANDS         1
+NBITS          32
+BANDROWBYTES   {load._PRISM_NCOLS * 4}
+TOTALROWBYTES  {load._PRISM_NCOLS * 4}
+PIXELTYPE      FLOAT
+ULXMAP         {load._PRISM_ULXMAP}
+ULYMAP         {load._PRISM_ULYMAP}
+XDIM           {load._PRISM_XDIM}
+YDIM           {load._PRISM_YDIM}
+NODATA         {load._PRISM_NODATA}
+"""
+
+
+def _links(names):
+    return "\n".join(f'<a href="{name}">{name}</a>' for name in names) + "\n"
+
+
+def write_crn_tree(root: Path, years, nstation: int) -> None:
+    """Write synthetic CRN daily01 files for `years` under `root`."""
+    years = [int(y) for y in np.atleast_1d(years)]
+    ncol = len(HEADER_COLUMNS)
+    root.mkdir(parents=True, exist_ok=True)
+    (root / "headers.txt").write_text(
+        " ".join(str(i + 1) for i in range(ncol))
+        + "\n"
+        + " ".join(HEADER_COLUMNS)
+        + "\n"
+        + " ".join("X" for _ in range(ncol))
+        + "\n"
+    )
+    (root / "index.html").write_text(_links(f"{year}/" for year in years))
+
+    for year in years:
+        rng = np.random.default_rng(year)
+        year_dir = root / str(year)
+        year_dir.mkdir()
+        dates = pd.date_range(f"{year}-01-01", f"{year}-12-31").strftime(r"%Y%m%d")
+        fns = []
+        for i in range(nstation):
+            fn = f"CRND0103-{year}-XX_Station_{i}.txt"
+            lat = rng.uniform(25, 49)
+            lon = rng.uniform(-124, -67)
+            data = rng.uniform(0, 40, size=(len(dates), ncol - 5))
+            lines = [
+                f"{10000 + i} {d} 2.622 {lon:8.2f} {lat:7.2f} " + " ".join(f"{x:7.3f}" for x in row)
+                for d, row in zip(dates, data)
+            ]
+            (year_dir / fn).write_text("\n".join(lines) + "\n")
+            fns.append(fn)
+        (year_dir / "index.html").write_text(_links(fns))
+
+
+def write_prism_tree(root: Path, days) -> None:
+    """Write synthetic PRISM daily precip zip archives (stable) for `days` under `root`."""
+    days = pd.DatetimeIndex(days)
+    lon = load._PRISM_ULXMAP + np.arange(load._PRISM_NCOLS) * load._PRISM_XDIM
+    lat = load._PRISM_ULYMAP - np.arange(load._PRISM_NROWS) * load._PRISM_YDIM
+    nodata = (lon[np.newaxis, :] < -123) & (lat[:, np.newaxis] < 40)  # "ocean"
+
+    root.mkdir(parents=True, exist_ok=True)
+    years = sorted({d.year for d in days})
+    (root / "index.html").write_text(_links(f"{year}/" for year in years))
+    for year in years:
+        year_dir = root / str(year)
+        year_dir.mkdir()
+        fns = []
+        for d in days[days.year == year]:
+            ymd = d.strftime(r"%Y%m%d")
+            stem = f"PRISM_ppt_stable_4kmD2_{ymd}_bil"
+            arr = np.random.default_rng(int(ymd)).gamma(0.3, 8, nodata.shape).astype(np.float32)
+            arr[nodata] = load._PRISM_NODATA
+            with zipfile.ZipFile(year_dir / f"{stem}.zip", "w", zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr(f"{stem}.bil", arr.astype("<f4").tobytes())
+                zf.writestr(f"{stem}.hdr", PRISM_HDR)
+            fns.append(f"{stem}.zip")
+        (year_dir / "index.html").write_text(_links(fns))
+
+
+def write_alexi_tree(root: Path, days) -> None:
+    """Write synthetic ALEXI ET binary files for `days` under `root`."""
+    days = pd.DatetimeIndex(days)
+    lon = load._ALEXI_LLLON + np.arange(load._ALEXI_NLON) * load._ALEXI_DLON
+    lat = load._ALEXI_LLLAT + np.arange(load._ALEXI_NLAT) * load._ALEXI_DLAT
+    nodata = (lon[np.newaxis, :] < -123) & (lat[:, np.newaxis] < 40)
+
+    root.mkdir(parents=True, exist_ok=True)
+    yjs = list(days.strftime(r"%Y%j"))
+    (root / "index.html").write_text("\n".join(f'<a href="{yj}/">{yj}</a>' for yj in yjs) + "\n")
+    for yj in yjs:
+        day_dir = root / yj
+        day_dir.mkdir()
+        arr = np.random.default_rng(int(yj)).uniform(0, 12, nodata.shape).astype(np.float32)
+        arr[nodata] = -9999
+        arr.astype("<f4").tofile(day_dir / f"ALEXI_ET_4KM_CONUS_V01_{yj}.dat")
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    latency = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency)  # simulated round-trip time
+        super().do_GET()
+
+    def do_HEAD(self):
+        time.sleep(self.latency)
+        super().do_HEAD()
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(root: Path, latency: float):
+    handler = type("Handler", (_Handler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@contextlib.contextmanager
+def standin_server(root: Path, days, *, nstation=100, latency=0.0):
+    """Write the synthetic data for `days` under `root`, serve it,
+    and point the `swampy.load` base URLs to it (restoring them on exit).
+    """
+    days = pd.DatetimeIndex(days)
+    write_crn_tree(root / "crn", sorted({d.year for d in days}), nstation)
+    write_prism_tree(root / "prism", days)
+    write_alexi_tree(root / "alexi", days)
+
+    server = serve(root, latency)
+    url = f"http://127.0.0.1:{server.server_port}"
+    names = ["CRN_BASE_URL", "PRISM_BASE_URL", "ALEXI_BASE_URL"]
+    saved = {name: getattr(load, name) for name in names}
+    load.CRN_BASE_URL = f"{url}/crn"
+    load.PRISM_BASE_URL = f"{url}/prism"
+    load.ALEXI_BASE_URL = f"{url}/alexi"
+    try:
+        yield server
+    finally:
+        for name, value in saved.items():
+            setattr(load, name, value)
+        server.shutdown()
+        server.server_close()
+
+
+def quiet():
+    """Silence the loaders' URL printing."""
+    return contextlib.redirect_stdout(io.StringIO())
@@ -0,0 +1,35 @@
+"""
+Build the SWAMP slope/intercept coefficient grids from the station fits
+(``orig/PROCESS_DAILY/presm_fits.txt``), replacing ``weight.f``,
+and save them for `swampy.calc.use_coeffs`.
+
+    python scripts/build-coeffs.py --weighting idw --out coeffs-idw/
+"""
+import argparse
+import time
+from pathlib import Path
+
+from swampy.coeffs import WEIGHTINGS, build_coeffs
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--out", type=Path, required=True, help="output directory")
+parser.add_argument("--weighting", choices=WEIGHTINGS, default="idw")
+parser.add_argument("--vegsoil", type=Path, help="vegsoil_dist_4km.nc (for --weighting vegsoil)")
+parser.add_argument("-k", type=int, default=8, help="number of nearest stations")
+parser.add_argument("--max-dist-km", type=float, default=None)
+parser.add_argument("--power", type=float, default=2, help="IDW power")
+parser.add_argument("--length-scale-km", type=float, default=100, help="Gaussian length scale")
+args = parser.parse_args()
+
+tic = time.perf_counter()
+ds = build_coeffs(
+    weighting=args.weighting,
+    vegsoil=args.vegsoil,
+    k=args.k,
+    max_dist_km=args.max_dist_km,
+    power=args.power,
+    length_scale_km=args.length_scale_km,
+    out=args.out,
+)
+print(f"built in {time.perf_counter() - tic:.1f} s ({ds.attrs})")
+print(ds.c1.to_series().describe())
@@ -0,0 +1,53 @@
+"""
+Daily operational update: advance SWAMP from the last checkpoint to the latest day
+and write the new days, computing only those days.
+
+The first time (no checkpoint yet), pass `--start` to run from a zero IC.
+
+    python scripts/daily-update.py --checkpoint swamp-state.npz --out-dir swamp-daily/
+"""
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+from swampy.calc import load_checkpoint, run, save_checkpoint
+from swampy.output import to_netcdf
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--checkpoint", type=Path, required=True)
+parser.add_argument("--out-dir", type=Path, required=True)
+parser.add_argument("--start", help="IC date for the initial run, if no checkpoint")
+parser.add_argument("--end", default=None, help="last day to compute (default: yesterday)")
+args = parser.parse_args()
+
+end = pd.Timestamp(args.end) if args.end else pd.Timestamp.now().floor("D") - pd.Timedelta("1D")
+if args.checkpoint.is_file():
+    start = load_checkpoint(args.checkpoint)["date"]
+    restart = args.checkpoint
+else:
+    if args.start is None:
+        parser.error(f"no checkpoint at {args.checkpoint}, so `--start` is needed")
+    start = pd.Timestamp(args.start)
+    restart = None
+
+if start >= end:
+    print(f"already up to date ({start:%Y-%m-%d})")
+    raise SystemExit
+
+ds = run(start, end, restart=restart)
+args.out_dir.mkdir(parents=True, exist_ok=True)
+for t in ds.time.to_index()[1 if restart is not None else 0 :]:
+    fp = args.out_dir / f"swamp_{t:%Y%m%d}.nc"
+    print(fp)
+    to_netcdf(ds.sel(time=[t]), fp)
+
+# Only advance the checkpoint once the new days are on disk,
+# so that a failed update is redone in full next time
+save_checkpoint(
+    args.checkpoint,
+    ds.time.values[-1],
+    ds.sm.values[-1],
+    ds.smn.values[-1],
+    settings_hash=ds.attrs["settings_hash"],
+)
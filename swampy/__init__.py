@@ -3,5 +3,14 @@ NOAA-ARL/ATDD Soil Water Analysis Model Product (SWAMP)
 """
 __version__ = "0.1.0.dev0"
 
-from .calc import GRID, C, run  # noqa: F401
+from .calc import iter_run, run, run_ensemble, run_points  # noqa: F401
 from .load import get_alexi, get_crn, get_prism, load_alexi  # noqa: F401
+
+
+def __getattr__(name):
+    # `GRID` and `C` are loaded on first access (see `swampy.calc`)
+    if name in {"GRID", "C"}:
+        from . import calc
+
+        return getattr(calc, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
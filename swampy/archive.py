@@ -0,0 +1,331 @@
+"""
+Build yearly netCDF archives of the ALEXI ET files
+(directories of daily ``.dat`` files, ~ 1.3 GB per year).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+_ARCHIVE_VERSION = 2
+"""Bump to invalidate existing archives (e.g. after a format change).
+Stored in the ``archive_version`` attribute, which `read_alexi_archive` checks."""
+
+_ALEXI_FN_PREFIX = "ALEXI_ET_4KM_CONUS_V01_"
+
+
+def alexi_archive_path(root, year) -> Path:
+    """Path of the archive for `year` under archive directory `root`."""
+    return Path(root) / f"{int(year)}.nc"
+
+
+def _source_files(src_dir: Path, year: int) -> dict[pd.Timestamp, Path]:
+    """ALEXI ET files of `year` in `src_dir`, by date."""
+    files = {}
+    for fp in sorted(src_dir.glob(f"{_ALEXI_FN_PREFIX}{year}???.dat")):
+        files[pd.to_datetime(fp.stem[-7:], format=r"%Y%j")] = fp
+
+    return files
+
+
+def _signature(files, settings) -> str:
+    """Hash of the source files (name, size, mtime) and build settings."""
+    h = hashlib.sha1(json.dumps([_ARCHIVE_VERSION, settings], sort_keys=True).encode())
+    for fp in sorted(files.values()):
+        st = fp.stat()
+        h.update(f"{fp.name} {st.st_size} {st.st_mtime_ns}\n".encode())
+
+    return h.hexdigest()
+
+
+def _archive_signature(fp: Path) -> str | None:
+    import netCDF4
+
+    try:
+        with netCDF4.Dataset(fp) as nc:
+            return getattr(nc, "source_signature", None)
+    except OSError:
+        return None
+
+
+def build_alexi_year(
+    src_dir,
+    dst,
+    year,
+    *,
+    layout="map",
+    compression="zlib",
+    complevel=5,
+    significant_digits=5,
+    force=False,
+):
+    """Write the ALEXI ET files of `year` in `src_dir` to netCDF file `dst`,
+    streaming them into a preallocated variable covering all days of the year,
+    so that at most one day (or, for the 'timeseries' layout, one band of rows) is in memory.
+
+    Days without a file are left missing (NaN)
+    and listed in the ``missing_dates`` attribute (space-separated ``YYYY-MM-DD``).
+
+    If `dst` was already built from the same files (names, sizes, modification times)
+    with the same settings, it is left as is (unless `force`).
+    The file is written to a temporary path first, so an interrupted build is not mistaken
+    for a complete one.
+
+    Parameters
+    ----------
+    layout, compression, complevel, significant_digits
+        See `swampy.output.to_netcdf`.
+
+    Returns
+    -------
+    dict
+        'year', 'status' ('built' or 'up to date') and 'missing_dates' (list of str).
+    """
+    import netCDF4
+
+    from .load import _ALEXI_NLAT, _ALEXI_NLON, _alexi_ds, _decode_alexi
+    from .output import _filter_kwargs, bitround, chunksizes
+
+    src_dir = Path(src_dir)
+    dst = Path(dst)
+    year = int(year)
+    dates = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq="D")
+    files = _source_files(src_dir, year)
+    if not files:
+        raise ValueError(f"no ALEXI ET files for {year} in {src_dir}")
+    settings = dict(
+        layout=layout,
+        compression=compression,
+        complevel=complevel,
+        significant_digits=significant_digits,
+    )
+    sig = _signature(files, settings)
+    missing = [d.strftime(r"%Y-%m-%d") for d in dates if d not in files]
+    if not force and dst.is_file() and _archive_signature(dst) == sig:
+        return {"year": year, "status": "up to date", "missing_dates": missing}
+
+    # Coordinates and attributes (with xarray, for the time encoding)
+    template = _alexi_ds(
+        np.zeros((_ALEXI_NLAT, _ALEXI_NLON), dtype=np.float32), dates[0].to_pydatetime()
+    )
+    et_attrs = dict(template.et.attrs)
+    template = template.drop_vars("et").assign_coords(time=dates)
+    template.attrs.update(
+        title=f"ALEXI ET {year}",
+        source=str(src_dir),
+        missing_dates=" ".join(missing),
+        source_signature=sig,
+        archive_version=_ARCHIVE_VERSION,
+    )
+    nsb = None
+    if significant_digits is not None:
+        nsb = math.ceil(significant_digits * math.log2(10))
+        et_attrs.update(quantization_algorithm="bitround", quantization_nsb=nsb)
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    template.to_netcdf(tmp, format="NETCDF4")
+    try:
+        with netCDF4.Dataset(tmp, "a") as nc:
+            dims = ("time", "lat", "lon")
+            shape = (len(dates), _ALEXI_NLAT, _ALEXI_NLON)
+            v = nc.createVariable(
+                "et",
+                np.float32,
+                dims,
+                fill_value=np.nan,
+                chunksizes=chunksizes(dims, shape, layout=layout),
+                **_filter_kwargs(compression, complevel, True),
+            )
+            v.setncatts(et_attrs)
+            v.set_auto_mask(False)
+
+            def decode(arr):
+                arr = _decode_alexi(np.array(arr, dtype=np.float32))
+                return arr if nsb is None else bitround(arr, nsb)
+
+            if layout == "map":
+                # One day at a time (unwritten days take no space)
+                for i, d in enumerate(dates):
+                    fp = files.get(d)
+                    if fp is not None:
+                        v[i] = decode(np.fromfile(fp, dtype=np.float32).reshape(shape[1:]))
+            else:
+                # One band of chunk rows at a time, for all days,
+                # so that each chunk is written once
+                band = v.chunking()[1]
+                mms = {
+                    i: np.memmap(files[d], dtype=np.float32, mode="r", shape=shape[1:])
+                    for i, d in enumerate(dates)
+                    if d in files
+                }
+                for a in range(0, shape[1], band):
+                    b = min(a + band, shape[1])
+                    block = np.full((len(dates), b - a, shape[2]), np.nan, dtype=np.float32)
+                    for i, mm in mms.items():
+                        block[i] = decode(mm[a:b])
+                    v[:, a:b, :] = block
+        os.replace(tmp, dst)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+    return {"year": year, "status": "built", "missing_dates": missing}
+
+
+def build_alexi_archive(src_root, dst_root, *, years=None, max_workers=None, **kwargs):
+    """Build the yearly ALEXI ET archives (``<dst_root>/<year>.nc``)
+    from the ``<src_root>/<year>/`` directories of daily files,
+    building the years in parallel worker processes.
+
+    Years whose archive is up to date are skipped. See `build_alexi_year`.
+
+    Parameters
+    ----------
+    years : list of int, optional
+        Default: all year directories in `src_root`.
+    max_workers : int, optional
+        Number of worker processes. Default: number of CPUs (at most the number of years).
+        With 1, the years are built in this process.
+    **kwargs
+        Passed to `build_alexi_year`.
+
+    Returns
+    -------
+    list of dict
+        Results of `build_alexi_year`, by year.
+    """
+    src_root = Path(src_root)
+    dst_root = Path(dst_root)
+    if years is None:
+        years = sorted(int(p.name) for p in src_root.glob("[0-9][0-9][0-9][0-9]") if p.is_dir())
+    years = [int(y) for y in years]
+
+    args = [(src_root / str(y), alexi_archive_path(dst_root, y), y) for y in years]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(years)))
+
+    if max_workers == 1:
+        return [build_alexi_year(*a, **kwargs) for a in args]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futs = [pool.submit(build_alexi_year, *a, **kwargs) for a in args]
+        return [f.result() for f in futs]
+
+
+def _find_store(root, year) -> Path | None:
+    """The archive store (netCDF file or Zarr directory) for `year` under `root`, if any."""
+    fp = alexi_archive_path(root, year)
+    if fp.is_file():
+        return fp
+    fp = fp.with_suffix(".zarr")
+    if fp.is_dir():
+        return fp
+
+    return None
+
+
+def _open_store(fp: Path, *, lazy=False):
+    """Open archive store `fp`, checking that it was built by `build_alexi_archive`
+    in the current format (e.g. not by the earlier ``make-alexi-archive-nc.py`` script,
+    whose ET wasn't converted to mm).
+    """
+    import xarray as xr
+
+    ds = xr.open_dataset(
+        fp,
+        engine="zarr" if fp.suffix == ".zarr" else None,
+        chunks={"time": 1} if lazy else None,
+    )
+    version = ds.attrs.get("archive_version")
+    units = ds["et"].attrs.get("units") if "et" in ds else None
+    if version is None or "source_signature" not in ds.attrs:
+        problem = "has no archive version or source signature (older format)"
+    elif int(version) != _ARCHIVE_VERSION:
+        problem = f"has archive version {version}, expected {_ARCHIVE_VERSION}"
+    elif units != "mm":
+        problem = f"has ET units {units!r}, expected 'mm'"
+    else:
+        return ds
+    ds.close()
+
+    raise ValueError(
+        f"ALEXI archive {str(fp)!r} {problem}. "
+        "Rebuild it with `swampy.archive.build_alexi_archive`."
+    )
+
+
+def _store_days(ds, days) -> tuple[list, np.ndarray]:
+    """Those of `days` that archive store `ds` has data for, and their time indices."""
+    missing = set(ds.attrs.get("missing_dates", "").split())
+    days = [d for d in days if d.strftime(r"%Y-%m-%d") not in missing]
+    idx = ds.indexes["time"].get_indexer(days)
+
+    return [d for d, i in zip(days, idx) if i >= 0], idx[idx >= 0]
+
+
+def _archived_alexi_days(root, days) -> set[str]:
+    """Those of `days` that the archive under `root` has data for
+    (``YYYYJJJ`` date strings), without reading the data.
+    """
+    days = pd.DatetimeIndex(days).floor("D").unique()
+    res = set()
+    for year in days.year.unique():
+        fp = _find_store(root, year)
+        if fp is None:
+            continue
+        with _open_store(fp) as ds:  # only the metadata is read
+            days_y, _ = _store_days(ds, days[days.year == year])
+        res.update(d.strftime(r"%Y%j") for d in days_y)
+
+    return res
+
+
+def read_alexi_archive(root, days, *, lazy=False) -> dict:
+    """Read ALEXI ET for `days` from the yearly stores under archive directory `root`
+    (``<year>.nc`` as built by `build_alexi_archive`, or ``<year>.zarr``).
+
+    Only the requested days are read, a year at a time
+    (so consecutive days come from contiguous chunks).
+    Days whose year isn't archived or that are in the store's ``missing_dates`` are skipped.
+    Stores not in the current format (see `build_alexi_archive`) raise ValueError.
+
+    With `lazy`, the arrays are Dask arrays (one chunk per day) instead of being read.
+
+    Returns
+    -------
+    dict
+        ET (mm) 2-D array, by ``YYYYJJJ`` date string.
+    """
+    from . import instrument
+
+    days = pd.DatetimeIndex(days).floor("D").unique()
+    res = {}
+    for year in days.year.unique():
+        fp = _find_store(root, year)
+        if fp is None:
+            continue
+
+        with instrument.span("alexi.archive", year=int(year), lazy=lazy):
+            ds = _open_store(fp, lazy=lazy)
+            days_y, idx = _store_days(ds, days[days.year == year])
+            et = ds.et.isel(time=idx)
+            if lazy:
+                et = et.data
+            else:
+                et = et.values.astype(np.float32, copy=False)
+                ds.close()
+            instrument.count("disk_cache_hits", len(days_y))
+
+        for d, a in zip(days_y, et):
+            res[d.strftime(r"%Y%j")] = a
+
+    return res
@@ -1,13 +1,19 @@
 """
 SWAMP
 """
+import contextlib
+import contextvars
+import functools
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 import xarray as xr
 
+from .instrument import record, span, submit
+
 warnings.filterwarnings("ignore", message=r"note 'stable' PRISM file for [0-9]{8} not found")
 warnings.filterwarnings("ignore", message=r"date [0-9]{7} not in detected ALEXI ET available dates")
 
@@ -17,6 +23,7 @@ _ORIG = _HERE / "../orig"
 _NLAT, _NLON = (720, 1150)
 
 
+@functools.lru_cache(maxsize=None)
 def _get_grid():
     # Define output grid
     # NOTE: this is 3.8-km in lat and ~ 4.4-km in lon
@@ -31,21 +38,132 @@ def _get_grid():
     return grid
 
 
-GRID = _get_grid()
+# For now, use the coeffs that already exist
+# NOTE: slp is the one that gets used in the current original SWAMP
+# NOTE: this array has 39% 0 values and 17% -21.52 values, the rest positive but < 1
+# NOTE: some of the -21.52 values are over land (TX ~ 27 and below, FL ~ 26 and below), makes results weird
+_COEFF_FILES = {"c0": "int_weights.txt", "c1": "slp_weights.txt"}
+"""Text files in ``orig/PROCESS_DAILY`` with the coefficients on the grid."""
+
+
+def _coeffs_cache_dir():
+    from .load import CACHE_DIR
+
+    return CACHE_DIR / "coeffs"
+
+
+def _sha1(fp):
+    import hashlib
+
+    h = hashlib.sha1()
+    with open(fp, "rb") as f:
+        for b in iter(lambda: f.read(1 << 20), b""):
+            h.update(b)
+    return h.hexdigest()
+
 
+def _load_coeffs_npy(d):
+    """Load ``c0.npy`` and ``c1.npy`` from directory `d` as read-only memmaps."""
+    c0 = np.load(d / "c0.npy", mmap_mode="r")
+    c1 = np.load(d / "c1.npy", mmap_mode="r")
+    if not c0.shape == c1.shape == (_NLAT, _NLON):
+        raise ValueError(f"coefficients in {str(d)!r} have unexpected grid shape")
+    return c0, c1
 
+
+def _save_coeffs_npy(d, c0, c1, meta):
+    """Save coefficients to directory `d` in the format `_load_coeffs_npy` reads,
+    with `meta` (e.g. source info) in ``coeffs.json``.
+    """
+    import json
+    import os
+
+    d.mkdir(parents=True, exist_ok=True)
+    pid = os.getpid()
+    for name, a in [("c0", c0), ("c1", c1)]:
+        tmp = d / f"{name}.npy.{pid}.tmp"
+        with open(tmp, "wb") as f:  # (`np.save` would append ``.npy`` to other names)
+            np.save(f, np.ascontiguousarray(a, dtype=np.float64))
+        os.replace(tmp, d / f"{name}.npy")
+    # Written last, so it only describes complete arrays
+    tmp = d / f"coeffs.json.{pid}.tmp"
+    tmp.write_text(json.dumps(meta, indent=1))
+    os.replace(tmp, d / "coeffs.json")
+
+
+_COEFFS_DIR = None
+"""Directory of coefficients from `swampy.coeffs.build_coeffs` to use (see `use_coeffs`)."""
+
+
+def use_coeffs(path=None):
+    """Use the coefficients saved by `swampy.coeffs.build_coeffs` to directory `path`,
+    or the original text files (``path=None``, the default), from now on.
+    """
+    global _COEFFS_DIR
+
+    if path is not None:
+        path = Path(path)
+        _load_coeffs_npy(path)  # check
+    _COEFFS_DIR = path
+    _read_coeffs.cache_clear()
+    _get_coeffs_ds.cache_clear()
+
+
+@functools.lru_cache(maxsize=None)
+def _read_coeffs():
+    """Intercept and slope coefficient arrays (read-only).
+
+    The text files are only parsed if they have changed (mtime and size, then SHA-1)
+    since they were last cached as ``.npy`` in ``CACHE_DIR/coeffs``.
+    """
+    import json
+
+    if _COEFFS_DIR is not None:
+        return _load_coeffs_npy(_COEFFS_DIR)
+
+    d = _coeffs_cache_dir()
+    sources = {}
+    for name, fn in _COEFF_FILES.items():
+        fp = (_ORIG / "PROCESS_DAILY" / fn).resolve()
+        st = fp.stat()
+        sources[name] = {"path": str(fp), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+    try:
+        cached = json.loads((d / "coeffs.json").read_text())["sources"]
+    except (OSError, ValueError, KeyError):
+        cached = None
+
+    if cached is not None and set(cached) == set(sources):
+        stat_keys = ("path", "mtime_ns", "size")
+        if all(
+            all(cached[name].get(k) == src[k] for k in stat_keys) for name, src in sources.items()
+        ):
+            return _load_coeffs_npy(d)
+
+        # mtime changes without content changes, e.g. with a fresh checkout
+        for name, src in sources.items():
+            src["sha1"] = _sha1(src["path"])
+        if all(cached[name].get("sha1") == src["sha1"] for name, src in sources.items()):
+            c0, c1 = _load_coeffs_npy(d)
+            _save_coeffs_npy(d, c0, c1, {"sources": sources})
+            return _load_coeffs_npy(d)
+
+    c0 = np.loadtxt(sources["c0"]["path"])
+    c1 = np.loadtxt(sources["c1"]["path"])
+    assert c0.shape == c1.shape == (_NLAT, _NLON)
+    for src in sources.values():
+        if "sha1" not in src:
+            src["sha1"] = _sha1(src["path"])
+    _save_coeffs_npy(d, c0, c1, {"sources": sources})
+
+    return _load_coeffs_npy(d)
+
+
+@functools.lru_cache(maxsize=None)
 def _get_coeffs_ds(*, mask_neg=True):
-    # For now, use the coeffs that already exist
-    # NOTE: slp is the one that gets used in the current original SWAMP
-    # NOTE: this array has 39% 0 values and 17% -21.52 values, the rest positive but < 1
-    # NOTE: some of the -21.52 values are over land (TX ~ 27 and below, FL ~ 26 and below), makes results weird
-    slp_coeffs = np.loadtxt(_ORIG / "PROCESS_DAILY/slp_weights.txt")
-    int_coeffs = np.loadtxt(_ORIG / "PROCESS_DAILY/int_weights.txt")
-    assert slp_coeffs.shape == int_coeffs.shape == (_NLAT, _NLON)
-    c0 = int_coeffs
-    c1 = slp_coeffs
-
-    ds = GRID.copy()
+    c0, c1 = _read_coeffs()
+
+    ds = _get_grid().copy()
     ds["c0"] = (("lat", "lon"), c0, {"long_name": "Intercept coefficient"})
     ds["c1"] = (("lat", "lon"), c1, {"long_name": "Slope coefficient"})
     if mask_neg:
@@ -54,80 +172,61 @@ def _get_coeffs_ds(*, mask_neg=True):
     return ds
 
 
-C = _get_coeffs_ds()
+_LAZY = {"GRID": _get_grid, "C": _get_coeffs_ds}
+"""Module attributes computed on first access (PEP 562),
+so that importing doesn't parse the coefficient files.
+"""
 
-_DEFAULT_METPY_INTERP_KWS = dict(interp_type="rbf", hres=0.1)
 
+def __getattr__(name):
+    try:
+        return _LAZY[name]()
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
 
-def _ic_crn(date, **kwargs):
-    from metpy.interpolate import interpolate_to_grid, remove_nan_observations
 
-    from .load import get_crn
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
+
 
-    interp_kws = {**_DEFAULT_METPY_INTERP_KWS, **kwargs}
+def _ic_crn(date, **kwargs):
+    from .interp import to_grid
+    from .load import get_crn
 
     # IC based on CRN
     # TODO: use interpolation to 25 cm using multiple levels
-    df = get_crn([date])
+    df = get_crn([date], columns=["SOIL_MOISTURE_20_DAILY"])
     x = df["LONGITUDE"]
     y = df["LATITUDE"]
     v = df["SOIL_MOISTURE_20_DAILY"].copy()
     v.loc[v == -99] = np.nan
-    x, y, v = remove_nan_observations(x, y, v)
-    xg, yg, vg = interpolate_to_grid(x, y, v, **interp_kws)
-    ic = xr.DataArray(
-        data=vg, coords={"lat": yg[:, 0], "lon": xg[0, :]}, dims=("lat", "lon")
-    ).interp(lat=GRID.lat, lon=GRID.lon)
+    ic = to_grid(x, y, v, **kwargs)
     return ic
 
 
 def _ic_awc(date, **kwargs):
     # AWC: available water content
     # This comes from the original code and was suggested by Temple Lee
-    from metpy.interpolate import interpolate_to_grid, remove_nan_observations
-
+    from .interp import to_grid
     from .load import get_crn
 
-    interp_kws = {**_DEFAULT_METPY_INTERP_KWS, **kwargs}
-
-    df = get_crn([date])
+    df = get_crn(
+        [date],
+        columns=["SOIL_MOISTURE_5_DAILY", "SOIL_MOISTURE_10_DAILY", "SOIL_MOISTURE_20_DAILY"],
+    )
 
     x = df["LONGITUDE"].copy()
     y = df["LATITUDE"].copy()
     v5cm = df["SOIL_MOISTURE_5_DAILY"].copy()
     v5cm.loc[v5cm == -99] = np.nan
-    # x, y, v5cm = remove_nan_observations(x, y, v5cm)
-    # xg, yg, vg5cm = interpolate_to_grid(x, y, v5cm, **interp_kws)
-
-    # x = df["LONGITUDE"].copy()
-    # y = df["LATITUDE"].copy()
     v10cm = df["SOIL_MOISTURE_10_DAILY"].copy()
     v10cm.loc[v10cm == -99] = np.nan
-    # x, y, v10cm = remove_nan_observations(x, y, v10cm)
-    # xg, yg, vg10cm = interpolate_to_grid(x, y, v10cm, **interp_kws)
-
-    # x = df["LONGITUDE"].copy()
-    # y = df["LATITUDE"].copy()
     v20cm = df["SOIL_MOISTURE_20_DAILY"].copy()
     v20cm.loc[v20cm == -99] = np.nan
-    # x, y, v20cm = remove_nan_observations(x, y, v20cm)
-    # xg, yg, vg20cm = interpolate_to_grid(x, y, v20cm, **interp_kws)
-
-    # awc = 7.5 * vg5cm + 7.5 * vg10cm + 20 * vg20cm
 
     # TODO: might be better to add gridded instead of adding first and then gridding
     awcp = 7.5 * v5cm + 7.5 * v10cm + 20 * v20cm
-    x, y, awc = remove_nan_observations(x, y, awcp)
-    xg, yg, awc = interpolate_to_grid(x, y, awc, **interp_kws)
-
-    ic = xr.DataArray(
-        data=awc,
-        coords={"lat": yg[:, 0], "lon": xg[0, :]},
-        dims=("lat", "lon"),
-    ).interp(
-        lat=GRID.lat,
-        lon=GRID.lon,
-    )
+    ic = to_grid(x, y, awcp, **kwargs)
 
     return ic
 
@@ -138,50 +237,356 @@ def _ic_zero(x):
     return x.where(x.isnull(), 0)
 
 
-def run(start, end, *, ic=None, ic_kws=None, use_intercept=False, quiet=False):
-    """Compute gridded soil moisture using the SWAMP algorithm.
+def _step(prev, delta, d, *, out):
+    """Advance soil moisture `prev` (m3 m-3) by one day, in place in `out`.
+
+    sm(i) = sm(i - 1) + [P - ET during day i]    Eq. 2 in SWAMP paper draft
+
+    Multiplying by the soil depth `d` (mm), we convert the previous sm field from m3 m-3 to mm.
+    This gives it units like: mm water per <soil depth> depth of soil per unit area.
+    Then, after adding `delta` (mm), we convert back.
+    """
+    np.multiply(prev, d, out=out)
+    np.add(out, delta, out=out)
+    np.divide(out, d, out=out)
+    np.clip(out, 0, 1, out=out)
+
+
+@contextlib.contextmanager
+def _tile_pool(n_workers, n):
+    """Thread pool and latitude tiles (slices of `n` rows) for tiled execution,
+    or ``(None, None)`` for serial.
+    """
+    if n_workers is None or n_workers <= 1:
+        yield None, None
+        return
+
+    tiles = [slice(a[0], a[-1] + 1) for a in np.array_split(np.arange(n), n_workers) if a.size]
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        yield pool, tiles
+
+
+def _advance(
+    sm_prev,
+    smn_prev,
+    delta_no_coeff,
+    *,
+    c1,
+    c0=None,
+    d,
+    delta,
+    out_sm,
+    out_smn,
+    pool=None,
+    tiles=None,
+):
+    """Advance sm and smn by one day, in place in `out_sm` and `out_smn`,
+    using `delta` as scratch space.
+
+    With `pool`, the latitude `tiles` are computed in parallel.
+    Only elementwise operations are used, so the result doesn't depend on the tiling.
+
+    The state arrays may have leading dimensions (e.g. ensemble member)
+    that `delta_no_coeff` and the coefficients are broadcast against.
+    """
+
+    def f(sl):
+        sl = (Ellipsis, sl, slice(None))
+        np.multiply(c1[sl], delta_no_coeff[sl], out=delta[sl])
+        if c0 is not None:
+            np.add(delta[sl], c0[sl], out=delta[sl])
+
+        _step(sm_prev[sl], delta[sl], d, out=out_sm[sl])
+        _step(smn_prev[sl], delta_no_coeff[sl], d, out=out_smn[sl])
+
+    if pool is None:
+        f(slice(None))
+    else:
+        for _ in pool.map(f, tiles):
+            pass
+
+
+@span("time_loop")
+def _integrate(sm, smn, p_minus_et, *, c1, c0=None, d, n_workers=None):
+    """Time-step the SWAMP model in place.
 
     Parameters
     ----------
-    start, end
-        Passed to `pandas.date_range` to generate the days to run.
-        Date `start` gets the IC.
-    ic : {'crn', 'awc', 'zero'} or 0 or xarray.DataArray, optional
-        Initial condition. Defaults to zero.
-    ic_kws : dict, optional
-        For example, MetPy interpolate-to-grid settings.
-    use_intercept : bool
-        Apply the intercept term (in addition to the slope term) to P - ET.
-    quiet : bool
-        Don't print info messages.
+    sm, smn : array
+        Shape (ntime, nlat, nlon), with the IC set at index 0.
+        Days 1 and on are computed.
+        For an ensemble, shape (ntime, nmember, nlat, nlon).
+        `smn` does not use the coefficients (like "smn" in the Fortran).
+    p_minus_et : array-like or iterable
+        Shape (ntime - 1, nlat, nlon), P - ET for days 1 and on.
+        Iterated over one day at a time, so can be lazy (e.g. Dask) or a generator.
+    c1, c0 : array
+        Slope and (optional) intercept coefficients.
+        Shape (nlat, nlon), or (nmember, nlat, nlon) for an ensemble.
+    d : float
+        Soil depth (mm).
+    n_workers : int, optional
+        Number of threads to split the latitude rows among. Default: serial.
     """
-    from .load import get_alexi, get_prism
+    delta = np.empty(sm.shape[1:])
+    p_minus_et = iter(p_minus_et) if sm.shape[0] > 1 else iter(())
+    with _tile_pool(n_workers, sm.shape[-2]) as (pool, tiles):
+        for i, delta_no_coeff in zip(range(1, sm.shape[0]), p_minus_et):
+            _advance(
+                sm[i - 1],
+                smn[i - 1],
+                np.asarray(delta_no_coeff),
+                c1=c1,
+                c0=c0,
+                d=d,
+                delta=delta,
+                out_sm=sm[i],
+                out_smn=smn[i],
+                pool=pool,
+                tiles=tiles,
+            )
+
+
+_SOIL_DEPTH_CM = 25
+"""Soil depth of interest (cm)."""
+
+
+def _get_ic(ic, date, ic_kws=None, *, c1=None):
+    """Get the initial condition DataArray on the grid from the `ic` setting of `run`.
+    The zero IC uses the land mask of `c1` (default: ``C.c1``).
+    """
+    if ic_kws is None:
+        ic_kws = {}
+    if c1 is None:
+        c1 = _get_coeffs_ds().c1
+
+    with span("ic", ic=_ic_label(ic)):
+        if isinstance(ic, xr.DataArray):
+            pass
+        elif ic is None or ic == 0 or isinstance(ic, str) and ic.lower() == "zero":
+            ic = _ic_zero(c1)
+        elif isinstance(ic, str) and ic.lower() == "crn":
+            ic = _ic_crn(date, **ic_kws)
+        elif isinstance(ic, str) and ic.lower() == "awc":
+            ic = _ic_awc(date, **ic_kws)
+        else:
+            raise ValueError(f"invalid `ic` setting {ic!r}")
+
+    return ic
+
+
+def _p_minus_et(p, et, *, regrid_method="bilinear", n_workers=None):
+    """Regrid P and ET to the grid and compute P - ET."""
+    from .regrid import regrid
+
+    grid = _get_grid()
+    with span("regrid", method=regrid_method):
+        p = regrid(p, grid.lat, grid.lon, method=regrid_method, n_workers=n_workers)
+        et = regrid(et, grid.lat, grid.lon, method=regrid_method, n_workers=n_workers)
+        p_minus_et = p - et
+    p_minus_et.attrs.update(long_name="P - ET", units="mm")
+
+    return p_minus_et
+
+
+def _load_p(days):
+    from .load import get_prism
+
+    with span("load_prism", days=len(days)):
+        return get_prism(days).ppt
 
-    days = pd.date_range(start, end, freq="D")
-    ntime = len(days)
 
-    # Compute P - ET at the grid
+def _load_et(days, *, lazy=False, fill=None):
+    """Load ALEXI ET for `days`.
+
+    `fill`, the part of an `_et_fill_plan` for `days`, gives the days to take the ET from,
+    for loading a longer period in chunks.
+    By default, missing days are filled from the other `days` (see `swampy.load.get_alexi`).
+    """
+    from .load import get_alexi
+
+    with span("load_alexi", days=len(days)):
+        if fill is None:
+            return get_alexi(days, lazy=lazy).et
+
+        days0, days1, w1 = fill
+        if (days0 == days).all() and (w1 == 0).all():
+            return get_alexi(days, lazy=lazy).et
+        et = get_alexi(days0.union(days1), lazy=lazy).et
+        # As `get_alexi` fills
+        ets = [
+            et.sel(time=a, drop=True)
+            if w == 0
+            else (1 - w) * et.sel(time=a, drop=True) + w * et.sel(time=b, drop=True)
+            for a, b, w in zip(days0, days1, w1)
+        ]
+        return xr.concat(ets, dim="time").assign_coords(time=days)
+
+
+def _et_fill_plan(days, *, fill="nearest"):
+    """For loading ALEXI ET for `days` in chunks, the days to take each day's ET from,
+    ``(days0, days1, w1)``, as for `swampy.load.get_alexi` (see `swampy.load._fill_index`)
+    but working out the fill over all of `days`,
+    so that the results don't depend on the chunking.
+    """
+    from .load import _alexi_available, _fill_index
+
+    days = pd.DatetimeIndex(days)
+    with span("alexi_availability", days=len(days)):
+        available = _alexi_available(days)
+    if not available.any():
+        raise ValueError("all ALEXI ET data is NaN, won't interpolate")
+    if not available.all():
+        missing = list(days[~available].strftime(r"%Y%j"))
+        warnings.warn(
+            f"ALEXI ET missing for dates {missing}, filling with method {fill!r}", stacklevel=3
+        )
+    i0, i1, w1 = _fill_index(available, fill)
+
+    return days[i0], days[i1], w1
+
+
+def _load_p_minus_et(
+    days, *, regrid_method="bilinear", lazy=False, n_workers=None, quiet=False, et_fill=None
+):
+    """Load P and ET (see `_load_et` for `et_fill`) for `days` and compute P - ET on the grid."""
     if not quiet:
         print("loading PRISM P")
-    p = get_prism(days).ppt
+    p = _load_p(days)
     if not quiet:
         print("loading ALEXI ET")
-    et = get_alexi(days).et
+    et = _load_et(days, lazy=lazy, fill=et_fill)
     if not quiet:
         print("computing P - ET")
-    # TODO: better interp, e.g. xESMF conservative (can store the weight file)
-    p_minus_et = p.interp(lat=GRID.lat, lon=GRID.lon) - et.interp(lat=GRID.lat, lon=GRID.lon)
-    p_minus_et.attrs.update(long_name="P - ET", units="mm")
 
-    # Initialize sm dataset
-    if not quiet:
-        print("computing SM")
-    soil_depth_cm = 25  # soil depth of interest
-    soil_depth_mm = soil_depth_cm * 10
-    ds = C.copy()
+    return _p_minus_et(p, et, regrid_method=regrid_method, n_workers=n_workers)
+
+
+def _iter_p_minus_et(
+    days, *, chunk_days=7, prefetch=0, regrid_method="bilinear", n_workers=None, quiet=False
+):
+    """Yield P - ET on the grid (2-D array) for each of `days`,
+    loading the inputs `chunk_days` days at a time.
+
+    With `prefetch`, the loading is pipelined in background threads:
+    PRISM and ALEXI are each loaded by their own thread (concurrently),
+    regridding by another, and at most `prefetch` chunks are loaded ahead
+    of the one being consumed.
+    The loading is recorded in a 'prefetch' span, nested in the spans open
+    when this function is called (not when iteration starts),
+    and the consumer's waits for it in 'prefetch_wait' spans.
+
+    Missing ALEXI ET days are filled from the available days of all of `days`
+    (as when they are loaded at once), not just their chunk.
+    """
+    # The generator body only runs on the first `next`, i.e. within the consumer's spans
+    return _iter_p_minus_et_gen(
+        days,
+        fill=_et_fill_plan(days) if len(days) > 0 else None,
+        chunk_days=chunk_days,
+        prefetch=prefetch,
+        regrid_method=regrid_method,
+        n_workers=n_workers,
+        quiet=quiet,
+        ctx=contextvars.copy_context(),
+    )
+
+
+def _iter_p_minus_et_gen(days, *, fill, chunk_days, prefetch, regrid_method, n_workers, quiet, ctx):
+    import queue
+    import threading
+
+    chunks = [days[i : i + chunk_days] for i in range(0, len(days), chunk_days)]
+    fills = [tuple(x[i : i + chunk_days] for x in fill) for i in range(0, len(days), chunk_days)]
+
+    if not prefetch:
+        for days_chunk, fill_chunk in zip(chunks, fills):
+            yield from _load_p_minus_et(
+                days_chunk,
+                regrid_method=regrid_method,
+                n_workers=n_workers,
+                quiet=quiet,
+                et_fill=fill_chunk,
+            ).values
+        return
+
+    # One thread per source, since the loaders' disk caches are not safe for concurrent writes
+    prism_pool = ThreadPoolExecutor(max_workers=1)
+    alexi_pool = ThreadPoolExecutor(max_workers=1)
+    futs: list = []  # (PRISM, ALEXI) futures per chunk
+    q: queue.Queue = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def produce():
+        try:
+            with span("prefetch", chunks=len(chunks)):
+                produce_chunks()
+        except BaseException as e:
+            put(e)
+        else:
+            put(done)
+
+    def produce_chunks():
+        for i, days_chunk in enumerate(chunks):
+            # Keep the loaders up to `prefetch` chunks ahead
+            while len(futs) < min(i + 1 + prefetch, len(chunks)):
+                j = len(futs)
+                futs.append(
+                    (
+                        submit(prism_pool, _load_p, chunks[j]),
+                        submit(alexi_pool, _load_et, chunks[j], fill=fills[j]),
+                    )
+                )
+            p_fut, et_fut = futs[i]
+            futs[i] = None
+            p = p_fut.result()
+            et = et_fut.result()
+            if stop.is_set():
+                return
+            if not quiet:
+                print(f"computing P - ET for {days_chunk[0]:%Y-%m-%d} to {days_chunk[-1]:%Y-%m-%d}")
+            put(_p_minus_et(p, et, regrid_method=regrid_method, n_workers=n_workers).values)
+
+    producer = threading.Thread(
+        target=ctx.copy().run, args=(produce,), name="swampy-prefetch", daemon=True
+    )
+    producer.start()
+    try:
+        while True:
+            with span("prefetch_wait"):
+                item = q.get()
+            if item is done:
+                break
+            elif isinstance(item, BaseException):
+                raise item
+            yield from item
+    finally:
+        stop.set()
+        for f in list(futs):
+            if f is not None:
+                f[0].cancel()
+                f[1].cancel()
+        producer.join()
+        prism_pool.shutdown()
+        alexi_pool.shutdown()
+
+
+def _make_ds(days, sm, smn, *, dims=("time", "lat", "lon"), coords=None):
+    """Construct the output Dataset (on the grid, unless `coords` are given)."""
+    soil_depth_cm = _SOIL_DEPTH_CM
+    ds = _get_grid().copy() if coords is None else xr.Dataset(coords=coords)
     ds["sm"] = (
-        ("time", "lat", "lon"),
-        np.empty((ntime, _NLAT, _NLON)),
+        dims,
+        sm,
         {
             "long_name": "Soil moisture",
             "units": "m3 m-3",
@@ -190,8 +595,8 @@ def run(start, end, *, ic=None, ic_kws=None, use_intercept=False, quiet=False):
         },
     )
     ds["smn"] = (
-        ("time", "lat", "lon"),
-        np.empty((ntime, _NLAT, _NLON)),
+        dims,
+        smn,
         {
             "long_name": "Soil moisture",
             "units": "m3 m-3",
@@ -202,7 +607,7 @@ def run(start, end, *, ic=None, ic_kws=None, use_intercept=False, quiet=False):
     ds["time"] = days
     ds["d"] = (
         (),
-        soil_depth_mm,
+        soil_depth_cm * 10,
         {
             "long_name": "Soil depth",
             "units": "mm",
@@ -210,45 +615,578 @@ def run(start, end, *, ic=None, ic_kws=None, use_intercept=False, quiet=False):
         },
     )
 
-    if ic_kws is None:
-        ic_kws = {}
+    return ds
+
+
+def _settings_hash(*, use_intercept, regrid_method):
+    """Hash of the settings that affect the time stepping,
+    so that a run is only resumed from a compatible checkpoint.
+    """
+    import hashlib
+
+    h = hashlib.sha1()
+    h.update(repr((_SOIL_DEPTH_CM, bool(use_intercept), regrid_method)).encode())
+    C = _get_coeffs_ds()
+    h.update(np.ascontiguousarray(C.c1.values).tobytes())
+    if use_intercept:
+        h.update(np.ascontiguousarray(C.c0.values).tobytes())
+
+    return h.hexdigest()
+
+
+def save_checkpoint(path, date, sm, smn, *, settings_hash):
+    """Save the model state at `date` (the last day computed) to `path` (``.npz``).
+
+    The file is written to a temporary path first,
+    so an interrupted save leaves the previous checkpoint intact.
+    """
+    import os
+    import threading
+
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:  # (`np.savez` would append ``.npz`` to other names)
+            np.savez(
+                f,
+                sm=np.asarray(sm),
+                smn=np.asarray(smn),
+                date=pd.Timestamp(date).strftime(r"%Y-%m-%d"),
+                settings_hash=settings_hash,
+            )
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def load_checkpoint(path):
+    """Load model state saved with `save_checkpoint`.
+
+    Returns
+    -------
+    dict
+        With keys 'date' (pandas.Timestamp), 'sm', 'smn', 'settings_hash'.
+    """
+    with np.load(path) as f:
+        return {
+            "date": pd.Timestamp(str(f["date"])),
+            "sm": f["sm"],
+            "smn": f["smn"],
+            "settings_hash": str(f["settings_hash"]),
+        }
+
+
+def _restart_state(restart, start, settings_hash):
+    """Get the sm and smn ICs from checkpoint `restart`, checking it is compatible."""
+    ck = load_checkpoint(restart)
+    if ck["date"] != pd.Timestamp(start).floor("D"):
+        raise ValueError(
+            f"checkpoint {str(restart)!r} is for {ck['date']:%Y-%m-%d}, "
+            f"but the run starts on {pd.Timestamp(start):%Y-%m-%d}. "
+            "The start date gets the IC, so should be the checkpoint date."
+        )
+    if ck["settings_hash"] != settings_hash:
+        raise ValueError(
+            f"checkpoint {str(restart)!r} was created with different settings "
+            "(`use_intercept`, `regrid_method`, or coefficients)"
+        )
+    if ck["sm"].shape != (_NLAT, _NLON) or ck["smn"].shape != (_NLAT, _NLON):
+        raise ValueError(f"checkpoint {str(restart)!r} has unexpected grid shape")
+
+    return ck["sm"], ck["smn"]
+
+
+def run(
+    start,
+    end,
+    *,
+    ic=None,
+    ic_kws=None,
+    use_intercept=False,
+    regrid_method="bilinear",
+    lazy=False,
+    restart=None,
+    checkpoint=None,
+    n_workers=None,
+    prefetch=0,
+    chunk_days=7,
+    quiet=False,
+    instrument=None,
+):
+    """Compute gridded soil moisture using the SWAMP algorithm.
+
+    Parameters
+    ----------
+    start, end
+        Passed to `pandas.date_range` to generate the days to run.
+        Date `start` gets the IC.
+    ic : {'crn', 'awc', 'zero'} or 0 or xarray.DataArray, optional
+        Initial condition. Defaults to zero.
+    ic_kws : dict, optional
+        For the 'crn' and 'awc' ICs, station interpolation settings,
+        such as ``method``. See `swampy.interp.to_grid`.
+    use_intercept : bool
+        Apply the intercept term (in addition to the slope term) to P - ET.
+    regrid_method : {'bilinear', 'nearest', 'conservative'}
+        How to regrid P and ET to the SWAMP grid. See `swampy.regrid.regrid`.
+        The weights are computed once and cached.
+    lazy : bool
+        Load ALEXI ET lazily (requires Dask),
+        so that only the day currently being computed is read and regridded
+        instead of the whole period at once.
+    restart : path-like, optional
+        Resume from a checkpoint saved by a previous run (see `checkpoint`)
+        instead of using `ic`.
+        `start` must be the checkpoint date, so, for example,
+        ``run(last, last + 1 day, restart=...)`` loads inputs for and computes only one day.
+    checkpoint : path-like, optional
+        Save the state on the last day (`end`) to this file (``.npz``),
+        for later use with `restart`.
+        This happens before the result is returned, so if the outputs must be on disk
+        before the next run restarts past them, save the checkpoint after writing them instead
+        (see `save_checkpoint` and ``ds.attrs["settings_hash"]``,
+        as in ``scripts/daily-update.py``).
+    n_workers : int, optional
+        Split the grid into this many latitude tiles,
+        regridding and time-stepping them in parallel threads (sharing the arrays).
+        The results are identical to the serial (default) ones.
+    prefetch : int
+        If nonzero, pipeline the input loading with the time stepping:
+        PRISM and ALEXI are loaded `chunk_days` days at a time, concurrently,
+        by background threads, up to `prefetch` chunks ahead of the day being computed,
+        so that downloading, decoding, regridding and computing overlap.
+        The results are identical: missing ALEXI ET days are filled
+        from the available days of the whole run, as without `prefetch`.
+    chunk_days : int
+        Number of days of inputs to load at a time with `prefetch`.
+    quiet : bool
+        Don't print info messages.
+    instrument : bool or callable or logging.Logger, optional
+        Record the time, downloads, cache hits and peak memory of the stages
+        (loading, decoding, regridding, IC, time loop; see `swampy.instrument`).
+        With `prefetch`, the loading and regridding are in a 'prefetch' stage,
+        and the time loop's waits for them in 'prefetch_wait'.
+        If true, return the report (see `swampy.instrument.Recorder.report`)
+        along with the Dataset.
+        If a function or logger, send each stage (dict) to it when it ends.
+
+    Returns
+    -------
+    xarray.Dataset
+        Or ``(ds, report)`` with ``instrument=True``.
 
-    if ic is None or ic == 0 or isinstance(ic, str) and ic.lower() == "zero":
-        ic = _ic_zero(ds.c1)
-    elif isinstance(ic, str) and ic.lower() == "crn":
-        ic = _ic_crn(start, **ic_kws)
-    elif isinstance(ic, str) and ic.lower() == "awc":
-        ic = _ic_awc(start, **ic_kws)
-    elif isinstance(ic, xr.DataArray):
-        pass
+    See Also
+    --------
+    iter_run : Same, but one day at a time with constant memory use.
+    swampy.output.to_netcdf : Write the result, chunked and compressed.
+    """
+    if instrument is None:
+        rec = contextlib.nullcontext()
     else:
-        raise ValueError(f"invalid `ic` setting {ic!r}")
-
-    ds["sm"].loc[dict(time=days[0])] = ic
-    ds["smn"].loc[dict(time=days[0])] = ic
-
-    for i in range(1, ntime):
-        # sm(i) = sm(i - 1) + [P - ET during day i]    Eq. 2 in SWAMP paper draft
-        delta_mm_no_coeff = p_minus_et.isel(time=i)
-        # ^ for "smn" in the Fortran (no weighting coeffs used)
-        delta_mm = ds.c1 * delta_mm_no_coeff
-        if use_intercept:
-            delta_mm += ds.c0
-
-        # Multiplying by the soil depth, we convert the previous sm field from m3 m-3 to mm
-        # This gives it units like: mm water per <soil depth> depth of soil per unit area
-        # Then, we convert back
-        ds["sm"].loc[dict(time=days[i])] = np.clip(
-            (soil_depth_mm * ds.sm.isel(time=i - 1) + delta_mm) / soil_depth_mm,
-            0,
-            1,
+        rec = record(None if instrument is True else instrument)
+
+    with rec as recorder, span("run"):
+        days = pd.date_range(start, end, freq="D")
+        ntime = len(days)
+        settings_hash = _settings_hash(use_intercept=use_intercept, regrid_method=regrid_method)
+
+        # Note: the first day gets the IC, so its inputs are not needed
+        if ntime > 1 and prefetch:
+            p_minus_et = _iter_p_minus_et(
+                days[1:],
+                chunk_days=chunk_days,
+                prefetch=prefetch,
+                regrid_method=regrid_method,
+                n_workers=n_workers,
+                quiet=quiet,
+            )
+        elif ntime > 1:
+            p_minus_et = _load_p_minus_et(
+                days[1:], regrid_method=regrid_method, lazy=lazy, n_workers=n_workers, quiet=quiet
+            ).data
+        else:
+            p_minus_et = None
+
+        sm = np.empty((ntime, _NLAT, _NLON))
+        smn = np.empty((ntime, _NLAT, _NLON))
+        if restart is not None:
+            sm[0], smn[0] = _restart_state(restart, start, settings_hash)
+        else:
+            sm[0] = _get_ic(ic, start, ic_kws).transpose("lat", "lon").values
+            smn[0] = sm[0]
+
+        # Compute sm
+        if not quiet:
+            print("computing SM")
+        C = _get_coeffs_ds()
+        _integrate(
+            sm,
+            smn,
+            p_minus_et,
+            c1=C.c1.values,
+            c0=C.c0.values if use_intercept else None,
+            d=_SOIL_DEPTH_CM * 10,
+            n_workers=n_workers,
         )
-        ds["smn"].loc[dict(time=days[i])] = np.clip(
-            (soil_depth_mm * ds.smn.isel(time=i - 1) + delta_mm_no_coeff) / soil_depth_mm,
-            0,
-            1,
+
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, days[-1], sm[-1], smn[-1], settings_hash=settings_hash)
+
+        ds = _make_ds(days, sm, smn)
+        ds.attrs["settings_hash"] = settings_hash
+
+    if instrument is True:
+        return ds, recorder.report()
+
+    return ds
+
+
+def iter_run(
+    start,
+    end,
+    *,
+    ic=None,
+    ic_kws=None,
+    use_intercept=False,
+    regrid_method="bilinear",
+    chunk_days=7,
+    restart=None,
+    checkpoint=None,
+    n_workers=None,
+    prefetch=0,
+    quiet=False,
+):
+    """Compute gridded soil moisture using the SWAMP algorithm,
+    yielding a Dataset (with a length-1 time dimension) for each day.
+
+    Only the previous day's state and the P - ET for the current chunk of days are kept,
+    so memory use doesn't depend on the length of the run.
+    Use `swampy.output.to_netcdf_stream` to write the days to disk as they are computed.
+
+    Parameters
+    ----------
+    chunk_days : int
+        Number of days of inputs to load at a time.
+        Missing ALEXI ET days are filled from the available days of the whole run,
+        so the results are the same as those of `run`.
+    checkpoint : path-like, optional
+        Save the state on the last day to this file
+        once the last day has been yielded.
+    prefetch : int
+        Number of chunks to load ahead in background threads
+        (e.g. while the consumer writes the yielded days). Default: none.
+
+    See `run` for the other parameters.
+    """
+    days = pd.date_range(start, end, freq="D")
+    settings_hash = _settings_hash(use_intercept=use_intercept, regrid_method=regrid_method)
+
+    C = _get_coeffs_ds()
+    c1 = C.c1.values
+    c0 = C.c0.values if use_intercept else None
+    d = _SOIL_DEPTH_CM * 10
+
+    if restart is not None:
+        sm_prev, smn_prev = _restart_state(restart, start, settings_hash)
+    else:
+        sm_prev = _get_ic(ic, start, ic_kws).transpose("lat", "lon").values.astype(np.float64)
+        smn_prev = sm_prev.copy()
+    yield _make_ds(days[:1], sm_prev[np.newaxis], smn_prev[np.newaxis])
+
+    p_minus_et = _iter_p_minus_et(
+        days[1:],
+        chunk_days=chunk_days,
+        prefetch=prefetch,
+        regrid_method=regrid_method,
+        n_workers=n_workers,
+        quiet=quiet,
+    )
+    delta = np.empty((_NLAT, _NLON))
+    with _tile_pool(n_workers, _NLAT) as (pool, tiles):
+        for day, delta_no_coeff in zip(days[1:], p_minus_et):
+            sm = np.empty((1, _NLAT, _NLON))
+            smn = np.empty((1, _NLAT, _NLON))
+            _advance(
+                sm_prev,
+                smn_prev,
+                delta_no_coeff,
+                c1=c1,
+                c0=c0,
+                d=d,
+                delta=delta,
+                out_sm=sm[0],
+                out_smn=smn[0],
+                pool=pool,
+                tiles=tiles,
+            )
+            yield _make_ds(pd.DatetimeIndex([day]), sm, smn)
+
+            sm_prev, smn_prev = sm[0], smn[0]
+
+    if checkpoint is not None:
+        save_checkpoint(checkpoint, days[-1], sm_prev, smn_prev, settings_hash=settings_hash)
+
+
+_ENSEMBLE_MEMBER_DEFAULTS = dict(ic=None, ic_kws=None, use_intercept=False, mask_neg=True)
+
+
+def _ic_label(ic):
+    if isinstance(ic, xr.DataArray):
+        return ic.name if ic.name is not None else "custom"
+    elif ic is None or ic == 0:
+        return "zero"
+    else:
+        return str(ic).lower()
+
+
+def run_ensemble(
+    start,
+    end,
+    members,
+    *,
+    regrid_method="bilinear",
+    lazy=False,
+    n_workers=None,
+    quiet=False,
+):
+    """Compute gridded soil moisture using the SWAMP algorithm
+    for several IC and coefficient settings at once.
+
+    P and ET are loaded and regridded only once,
+    and all members are advanced together along a ``member`` dimension.
+    Each member's result is the same as that of the corresponding `run`.
+
+    Parameters
+    ----------
+    start, end
+        Passed to `pandas.date_range` to generate the days to run.
+        Date `start` gets the IC.
+    members : list of dict
+        Settings for each member, with keys (all optional):
+
+        - 'ic', 'ic_kws', 'use_intercept' -- see `run`
+        - 'mask_neg' (bool) -- set non-positive slope coefficients to NaN (default: true).
+          The zero IC uses the land mask of the member's slope coefficients.
+
+        ICs shared by multiple members are only computed once.
+    regrid_method, lazy, n_workers, quiet
+        See `run`.
+
+    Returns
+    -------
+    xarray.Dataset
+        With ``sm`` and ``smn`` dims (time, member, lat, lon)
+        and the member settings as ``member`` coordinates.
+
+    Examples
+    --------
+    >>> members = [
+    ...     dict(ic=ic, use_intercept=use_intercept)
+    ...     for ic in ["zero", "crn", "awc"]
+    ...     for use_intercept in [False, True]
+    ... ]
+    >>> ds = run_ensemble("2022-06-01", "2022-06-30", members)
+    """
+    members = list(members)
+    if not members:
+        raise ValueError("`members` must not be empty")
+    for m in members:
+        invalid = set(m) - set(_ENSEMBLE_MEMBER_DEFAULTS)
+        if invalid:
+            raise ValueError(
+                f"invalid member setting(s) {sorted(invalid)}. "
+                f"Valid: {sorted(_ENSEMBLE_MEMBER_DEFAULTS)}"
+            )
+    members = [{**_ENSEMBLE_MEMBER_DEFAULTS, **m} for m in members]
+    nmember = len(members)
+
+    days = pd.date_range(start, end, freq="D")
+    ntime = len(days)
+
+    # Note: the first day gets the IC, so its inputs are not needed
+    if ntime > 1:
+        p_minus_et = _load_p_minus_et(
+            days[1:], regrid_method=regrid_method, lazy=lazy, n_workers=n_workers, quiet=quiet
+        ).data
+    else:
+        p_minus_et = None
+
+    sm = np.empty((ntime, nmember, _NLAT, _NLON))
+    smn = np.empty((ntime, nmember, _NLAT, _NLON))
+    c1 = np.empty((nmember, _NLAT, _NLON))
+    c0 = np.zeros((nmember, _NLAT, _NLON))  # adding 0 is the same as no intercept
+    coeffs = {}
+    ics = {}
+    for i, m in enumerate(members):
+        mask_neg = bool(m["mask_neg"])
+        if mask_neg not in coeffs:
+            coeffs[mask_neg] = _get_coeffs_ds(mask_neg=mask_neg)
+        c1[i] = coeffs[mask_neg].c1.values
+        if m["use_intercept"]:
+            c0[i] = coeffs[mask_neg].c0.values
+
+        ic = m["ic"]
+        if isinstance(ic, xr.DataArray):
+            sm[0, i] = _get_ic(ic, start).transpose("lat", "lon").values
+        else:
+            label = _ic_label(ic)
+            # (only the zero IC depends on the coefficients, through the land mask)
+            key = (label, repr(m["ic_kws"]), mask_neg if label == "zero" else None)
+            if key not in ics:
+                if not quiet:
+                    print(f"computing IC {key[0]!r}")
+                ics[key] = (
+                    _get_ic(ic, start, m["ic_kws"], c1=coeffs[mask_neg].c1)
+                    .transpose("lat", "lon")
+                    .values
+                )
+            sm[0, i] = ics[key]
+    smn[0] = sm[0]
+
+    if not quiet:
+        print(f"computing SM for {nmember} members")
+    _integrate(
+        sm,
+        smn,
+        p_minus_et,
+        c1=c1,
+        c0=c0 if any(m["use_intercept"] for m in members) else None,
+        d=_SOIL_DEPTH_CM * 10,
+        n_workers=n_workers,
+    )
+
+    ds = _make_ds(days, sm, smn, dims=("time", "member", "lat", "lon"))
+    ds = ds.assign_coords(
+        member=np.arange(nmember),
+        ic=("member", [_ic_label(m["ic"]) for m in members]),
+        use_intercept=("member", [bool(m["use_intercept"]) for m in members]),
+        mask_neg=("member", [bool(m["mask_neg"]) for m in members]),
+    )
+
+    return ds
+
+
+def _crn_points(date):
+    """CRN station locations (with 20-cm soil moisture data on `date`), indexed by WBANNO."""
+    from .load import get_crn
+
+    df = get_crn([date], columns=["SOIL_MOISTURE_20_DAILY"])
+    return (
+        df.drop_duplicates("WBANNO")
+        .set_index("WBANNO")
+        .rename(columns={"LATITUDE": "lat", "LONGITUDE": "lon"})[["lat", "lon"]]
+    )
+
+
+def run_points(
+    start,
+    end,
+    points=None,
+    *,
+    method="nearest",
+    ic=None,
+    ic_kws=None,
+    use_intercept=False,
+    regrid_method="bilinear",
+    chunk_days=31,
+    quiet=False,
+):
+    """Compute soil moisture using the SWAMP algorithm at points only (e.g. stations),
+    like the original station product (``orig/PROCESS_DAILY_STATION``).
+
+    The points are mapped to grid cells once,
+    and P and ET are regridded to, and the model time-stepped on, only those cells,
+    so this is much cheaper than `run` for a few hundred points.
+    With ``method='nearest'``, the results are the same as those of `run`
+    at the cells containing the points.
+
+    Parameters
+    ----------
+    start, end
+        Passed to `pandas.date_range` to generate the days to run.
+        Date `start` gets the IC.
+    points : pandas.DataFrame, optional
+        With columns 'lat' and 'lon', indexed by station (or point) ID.
+        Default: the CRN stations with 20-cm soil moisture data on `start`.
+    method : {'nearest', 'bilinear'}
+        'nearest': use the grid cell containing each point
+        (like ``statmatch.f``).
+        'bilinear': interpolate from the 2x2 stencil of cells around each point
+        (the model is run on all of them).
+        Points off the grid or next to a cell without coefficients (e.g. water) are NaN.
+    chunk_days : int
+        Number of days of inputs to load at a time.
+        Missing ALEXI ET days are filled from the available days of the whole run, as in `run`.
+    ic, ic_kws, use_intercept, regrid_method, quiet
+        See `run`.
+        The IC is computed on the grid and then taken at the cells.
+
+    Returns
+    -------
+    xarray.Dataset
+        With ``sm`` and ``smn`` dims (time, station)
+        (``ds.sm.to_pandas()`` for a time x station table).
+    """
+    from .regrid import get_point_weights, regrid_cells
+
+    days = pd.date_range(start, end, freq="D")
+    ntime = len(days)
+    if points is None:
+        points = _crn_points(days[0])
+    lat = np.asarray(points["lat"], dtype=np.float64)
+    lon = np.asarray(points["lon"], dtype=np.float64)
+    if lat.size == 0:
+        raise ValueError("no points")
+
+    # Index of the grid cells needed and the weights from them to the points
+    grid = _get_grid()
+    w = get_point_weights(grid.lat.values, grid.lon.values, lat, lon, method)
+    cells = np.unique(w.indices)
+    w = w[:, cells]
+
+    with span("run_points", points=lat.size, cells=cells.size):
+        p_minus_et = np.empty((max(ntime - 1, 0), 1, cells.size))
+        fill = _et_fill_plan(days[1:]) if ntime > 1 else None
+        for a in range(1, ntime, chunk_days):
+            days_chunk = days[a : a + chunk_days]
+            if not quiet:
+                print(f"loading P and ET for {days_chunk[0]:%Y-%m-%d} to {days_chunk[-1]:%Y-%m-%d}")
+            p = _load_p(days_chunk)
+            et = _load_et(days_chunk, fill=tuple(x[a - 1 : a - 1 + chunk_days] for x in fill))
+            with span("regrid", method=regrid_method, cells=cells.size):
+                kws = dict(method=regrid_method)
+                p = regrid_cells(p, grid.lat, grid.lon, cells, **kws)
+                et = regrid_cells(et, grid.lat, grid.lon, cells, **kws)
+                p_minus_et[a - 1 : a - 1 + len(days_chunk), 0] = (p - et).values
+
+        sm = np.empty((ntime, 1, cells.size))
+        smn = np.empty((ntime, 1, cells.size))
+        sm[0, 0] = _get_ic(ic, start, ic_kws).transpose("lat", "lon").values.ravel()[cells]
+        smn[0] = sm[0]
+
+        if not quiet:
+            print(f"computing SM at {lat.size} points ({cells.size} cells)")
+        C = _get_coeffs_ds()
+        _integrate(
+            sm,
+            smn,
+            p_minus_et,
+            c1=C.c1.values.ravel()[cells][np.newaxis],
+            c0=C.c0.values.ravel()[cells][np.newaxis] if use_intercept else None,
+            d=_SOIL_DEPTH_CM * 10,
         )
 
-    ds = ds.drop_vars(["c0", "c1"])
+    coords = {
+        "station": np.asarray(points.index),
+        "lat": ("station", lat, grid.lat.attrs),
+        "lon": ("station", lon, grid.lon.attrs),
+    }
+    off_grid = np.asarray(w.sum(axis=1)).ravel() == 0
+    sm_pts, smn_pts = ((w @ x[:, 0].T).T for x in (sm, smn))
+    sm_pts[:, off_grid] = np.nan
+    smn_pts[:, off_grid] = np.nan
+    ds = _make_ds(days, sm_pts, smn_pts, dims=("time", "station"), coords=coords)
+    ds.attrs["point_method"] = method
 
     return ds
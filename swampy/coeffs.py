@@ -0,0 +1,289 @@
+"""
+Build the SWAMP slope and intercept coefficient grids from the station fits,
+replacing ``orig/PROCESS_DAILY/weight.f``.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+WEIGHTINGS = ("vegsoil", "nearest", "idw", "gaussian")
+
+_R_EARTH_KM = 6371.0
+
+
+def read_presm_fits(fp=None):
+    """Read the per-station soil moisture fits (``presm_fits.txt``).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns 'int', 'rsq', 'slp', one row per station, with -99 as NaN.
+    """
+    if fp is None:
+        from .calc import _ORIG
+
+        fp = _ORIG / "PROCESS_DAILY/presm_fits.txt"
+
+    df = pd.read_csv(fp, delim_whitespace=True, header=None, names=["int", "rsq", "slp"])
+
+    return df.replace(-99, np.nan)
+
+
+def read_station_locations(fp=None):
+    """Read station ID, latitude and longitude (``stationID_lat_lon.txt`` format).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns 'id', 'lat', 'lon'.
+    """
+    if fp is None:
+        from .calc import _ORIG
+
+        fp = _ORIG / "MAIN_CRN/stationID_lat_lon.txt"
+
+    df = pd.read_csv(fp, delim_whitespace=True, header=None, names=["id", "lat", "lon"])
+    df["id"] = df["id"].astype(int)
+
+    return df
+
+
+def presm_stations():
+    """Locations of the stations of the fits in ``presm_fits.txt``,
+    assuming they are in the order of ``MAIN_CRN/soil_properties.txt``
+    (the site IDs of which are looked up in ``stationID_lat_lon.txt``).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns 'id', 'lat', 'lon', with NaN lat/lon for the few sites not in the lookup.
+    """
+    from .calc import _ORIG
+
+    site_id = np.loadtxt(_ORIG / "MAIN_CRN/soil_properties.txt")[:, 0].astype(int)
+    loc = read_station_locations().drop_duplicates("id").set_index("id")
+
+    return loc.reindex(site_id).rename_axis("id").reset_index()
+
+
+def _xyz(lat, lon):
+    """Unit-sphere Cartesian coordinates, for KD-tree queries by great-circle distance."""
+    lat = np.deg2rad(np.asarray(lat, dtype=float))
+    lon = np.deg2rad(np.asarray(lon, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _chord_to_km(chord):
+    return 2 * _R_EARTH_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def _vegsoil_index(vegsoil, lat, lon, *, tol=(0.05, 0.06), block=100_000):
+    """For the target points, the index of the cell of the veg/soil grid
+    (flattened ``LAT2D``/``LON2D``) strictly within `tol` (lat, lon) degrees, or -1 if none.
+
+    Like `weight.f`, which loops over the x index (outer) and y index (inner)
+    of the veg/soil grid, keeping the last match,
+    the match with the largest x index (then y index) is used.
+    """
+    from scipy.spatial import cKDTree
+
+    lat2d = np.asarray(vegsoil["LAT2D"], dtype=float)
+    lon2d = np.asarray(vegsoil["LON2D"], dtype=float)
+    ny, nx = lat2d.shape
+    n = lat2d.size
+
+    # With these scalings, the tolerance box is the unit ball in the max norm
+    dlat, dlon = tol
+    tree = cKDTree(np.column_stack([lat2d.ravel() / dlat, lon2d.ravel() / dlon]))
+    pts = np.column_stack([lat / dlat, lon / dlon])
+    res = np.full(len(pts), -1)
+    for a in range(0, len(pts), block):
+        # All the matches (increasing `k` until no point has more)
+        k = 16
+        while True:
+            _, i = tree.query(pts[a : a + block], k=min(k, n), p=np.inf, distance_upper_bound=1)
+            i = i.reshape(len(i), -1)
+            found = i < n
+            if k >= n or not found[:, -1].any():
+                break
+            k *= 2
+        iy, ix = np.divmod(np.where(found, i, 0), nx)
+        order = np.where(found, ix * ny + iy, -1)
+        last = np.take_along_axis(i, order.argmax(axis=1)[:, np.newaxis], axis=1)[:, 0]
+        res[a : a + len(i)] = np.where(found.any(axis=1), last, -1)
+
+    return res
+
+
+def weight_f_mask():
+    """Cells of the original slope coefficients (``orig/PROCESS_DAILY/slp_weights.txt``,
+    computed by `weight.f`) that are nonzero, i.e. the land cells with veg/soil data.
+    """
+    from . import calc
+
+    if calc._COEFFS_DIR is None:
+        c1 = calc._read_coeffs()[1]  # (cached)
+    else:
+        c1 = np.loadtxt(calc._ORIG / "PROCESS_DAILY" / calc._COEFF_FILES["c1"])
+
+    return np.isfinite(c1) & (c1 != 0)
+
+
+def build_coeffs(
+    fits=None,
+    stations=None,
+    *,
+    weighting="idw",
+    vegsoil=None,
+    k=8,
+    max_dist_km=None,
+    power=2,
+    length_scale_km=100,
+    land_mask=None,
+    out=None,
+):
+    """Compute the intercept (c0) and slope (c1) coefficients on the SWAMP grid
+    as weighted averages of the station fits.
+
+    With the 'vegsoil' weighting, the result matches `weight.f`
+    except that cells outside `land_mask` are NaN rather than 0
+    (`calc` masks both, as non-positive slope or NaN).
+
+    Parameters
+    ----------
+    fits : pandas.DataFrame, optional
+        Station fits, with columns 'int' and 'slp' (see `read_presm_fits`, the default).
+        Stations with NaN fits are skipped.
+    stations : pandas.DataFrame, optional
+        Station 'lat' and 'lon', in the same order as `fits`.
+        Stations with NaN location are skipped.
+        Default: `presm_stations` (if `fits` is also the default).
+    weighting : {'idw', 'gaussian', 'nearest', 'vegsoil'}
+        - 'idw': inverse distance to the power `power`
+        - 'gaussian': ``exp(-(distance / length_scale_km)^2)``
+        - 'nearest': the nearest station's fits
+        - 'vegsoil': the veg/soil similarity weights of `vegsoil` (like `weight.f`),
+          0 where they are all zero (as in `weight.f`)
+
+        With the distance weightings, the `k` nearest stations within `max_dist_km`
+        (great-circle) contribute, and cells with none are NaN.
+    vegsoil : xarray.Dataset or path-like, optional
+        With ``VGSLD`` (station, y, x), ``LAT2D`` and ``LON2D``
+        (i.e. ``vegsoil_dist_4km.nc``). Required for the 'vegsoil' weighting.
+    land_mask : array-like of bool, optional
+        Shape (lat, lon), true where the coefficients are computed (NaN elsewhere).
+        Default: `weight_f_mask`.
+    out : path-like, optional
+        Also save the result to this directory,
+        in the format `swampy.calc.use_coeffs` reads.
+
+    Returns
+    -------
+    xarray.Dataset
+        With ``c0`` and ``c1`` on the SWAMP grid.
+    """
+    from .calc import _NLAT, _NLON, _get_grid, _save_coeffs_npy
+
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"invalid weighting {weighting!r}. Valid: {WEIGHTINGS}")
+    if fits is None:
+        fits = read_presm_fits()
+        if stations is None and weighting != "vegsoil":
+            stations = presm_stations()
+
+    grid = _get_grid()
+    lat, lon = np.meshgrid(grid.lat.values, grid.lon.values, indexing="ij")
+    lat = lat.ravel()
+    lon = lon.ravel()
+    vals = fits[["int", "slp"]].to_numpy(dtype=float)
+    valid = np.isfinite(vals).all(axis=1)
+
+    if weighting == "vegsoil":
+        if vegsoil is None:
+            raise ValueError("the 'vegsoil' weighting requires `vegsoil`")
+        if not isinstance(vegsoil, xr.Dataset):
+            vegsoil = xr.open_dataset(vegsoil)
+        if vegsoil["VGSLD"].shape[0] != len(fits):
+            raise ValueError(
+                f"`vegsoil` has {vegsoil['VGSLD'].shape[0]} stations, but `fits` has {len(fits)}"
+            )
+        v = vegsoil["VGSLD"].values
+        v = v.reshape(v.shape[0], -1)[valid]
+        vals = vals[valid]
+        i = _vegsoil_index(vegsoil, lat, lon)
+        num = np.zeros((2, lat.size))
+        den = np.zeros(lat.size)
+        # In blocks of points, to limit the memory use of the (station, point) weights
+        for a in range(0, lat.size, 50_000):
+            ib = i[a : a + 50_000]
+            w = np.where(ib >= 0, v[:, ib], 0).astype(np.float64)
+            w[~np.isfinite(w)] = 0
+            num[:, a : a + ib.size] = vals.T @ w
+            den[a : a + ib.size] = w.sum(axis=0)
+    else:
+        from scipy.spatial import cKDTree
+
+        if stations is None:
+            raise ValueError(f"the {weighting!r} weighting requires `stations`")
+        if len(stations) != len(fits):
+            raise ValueError(f"{len(stations)} `stations`, but {len(fits)} `fits`")
+        valid &= np.isfinite(stations[["lat", "lon"]].to_numpy(dtype=float)).all(axis=1)
+        vals = vals[valid]
+        sta = stations[valid]
+        tree = cKDTree(_xyz(sta["lat"], sta["lon"]))
+        kk = 1 if weighting == "nearest" else min(k, len(vals))
+        ub = np.inf if max_dist_km is None else 2 * np.sin(max_dist_km / _R_EARTH_KM / 2)
+        chord, i = tree.query(_xyz(lat, lon), k=kk, distance_upper_bound=ub)
+        chord = chord.reshape(lat.size, kk)
+        i = i.reshape(lat.size, kk)
+        found = i < len(vals)
+        d = np.where(found, _chord_to_km(np.where(found, chord, 0)), np.inf)
+
+        if weighting == "nearest":
+            w = found.astype(float)
+        elif weighting == "idw":
+            with np.errstate(divide="ignore"):
+                w = 1 / d**power
+            # At a station, use its value
+            at = np.isinf(w)
+            w = np.where(at.any(axis=1, keepdims=True), at.astype(float), w)
+        else:  # gaussian
+            w = np.exp(-((d / length_scale_km) ** 2))
+        w[~found] = 0
+
+        vals = np.vstack([vals, [np.nan, np.nan]])  # index for not-found neighbors
+        num = np.einsum("pk,pkc->cp", w, np.where(found[..., np.newaxis], vals[i], 0))
+        den = w.sum(axis=1)
+
+    if land_mask is None:
+        land_mask = weight_f_mask()
+    land_mask = np.asarray(land_mask, dtype=bool)
+    if land_mask.shape != (_NLAT, _NLON):
+        raise ValueError(f"`land_mask` must have shape {(_NLAT, _NLON)}, got {land_mask.shape}")
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        no_data = 0 if weighting == "vegsoil" else np.nan
+        c0, c1 = np.where(den > 0, num / den, no_data).reshape(2, _NLAT, _NLON)
+    c0[~land_mask] = np.nan
+    c1[~land_mask] = np.nan
+
+    ds = grid.copy()
+    ds["c0"] = (("lat", "lon"), c0, {"long_name": "Intercept coefficient"})
+    ds["c1"] = (("lat", "lon"), c1, {"long_name": "Slope coefficient"})
+    settings = dict(weighting=weighting, nstation=int(valid.sum()))
+    if weighting != "vegsoil":
+        settings.update(k=k, max_dist_km=max_dist_km)
+        if weighting == "idw":
+            settings.update(power=power)
+        elif weighting == "gaussian":
+            settings.update(length_scale_km=length_scale_km)
+    ds.attrs.update({key: val for key, val in settings.items() if val is not None})
+
+    if out is not None:
+        _save_coeffs_npy(Path(out), c0, c1, {"builder": settings})
+
+    return ds
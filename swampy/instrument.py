@@ -0,0 +1,227 @@
+"""
+Record the time, downloads, cache use and memory of the stages of `swampy.calc.run`
+and the loaders.
+
+    from swampy.instrument import record
+
+    with record() as rec:
+        ds = swampy.run("2022-06-01", "2022-06-30")
+    print(rec.summary())
+
+Stages are recorded as spans (see `span`), nested by context,
+including in worker threads started with `submit`/`wrap`.
+When nothing is being recorded, `span` and `count` do (almost) nothing.
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import logging
+import threading
+import time
+import tracemalloc
+
+_RECORDERS: list[Recorder] = []
+_RECORDERS_LOCK = threading.Lock()
+
+_OPEN: contextvars.ContextVar[tuple] = contextvars.ContextVar("swampy_open_spans", default=())
+"""Spans open in the current context, innermost last."""
+
+_TRACED: list[dict] = []
+"""Spans (in any thread) currently tracing peak memory."""
+
+_SPANS_LOCK = threading.Lock()
+"""For updating open spans, which can be shared by threads."""
+
+COUNTERS = (
+    "requests",
+    "bytes_downloaded",
+    "memory_cache_hits",
+    "memory_cache_misses",
+    "disk_cache_hits",
+)
+"""Counters recorded by swampy (`count` accepts any name)."""
+
+
+class Recorder:
+    """Collects the spans and counter totals while active (see `record`).
+
+    Parameters
+    ----------
+    callback : callable or logging.Logger, optional
+        Called with each span (dict) when it ends.
+        A logger gets a DEBUG message per span, with the span as ``extra={"span": ...}``.
+    memory : bool
+        Trace the peak memory of each span with `tracemalloc` (slows allocation).
+    """
+
+    def __init__(self, callback=None, *, memory=True):
+        if isinstance(callback, logging.Logger):
+            logger = callback
+
+            def callback(span):
+                logger.debug("%s: %.3f s", span["name"], span["seconds"], extra={"span": span})
+
+        self.callback = callback
+        self.memory = memory
+        self.spans: list[dict] = []
+        self.totals: dict[str, int] = {}
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _add(self, span: dict) -> None:
+        with self._lock:
+            self.spans.append(span)
+        if self.callback is not None:
+            self.callback(span)
+
+    def _count(self, name: str, n: int) -> None:
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0) + n
+
+    def report(self) -> dict:
+        """The spans (in order of ending) and counter totals, as plain (JSON-serializable) data."""
+        with self._lock:
+            return {"spans": list(self.spans), "totals": dict(self.totals)}
+
+    def summary(self):
+        """Spans aggregated by name, as a DataFrame:
+        count, total and max seconds, max peak memory, and the counters summed.
+        """
+        import pandas as pd
+
+        df = pd.DataFrame(
+            [
+                {
+                    "name": s["name"],
+                    "seconds": s["seconds"],
+                    "peak_memory": s.get("peak_memory"),
+                    **s["counters"],
+                }
+                for s in self.report()["spans"]
+            ]
+        )
+        if df.empty:
+            return df
+        counters = [c for c in df.columns if c not in {"name", "seconds", "peak_memory"}]
+        g = df.groupby("name", sort=False)
+        res = g.seconds.agg(["count", "sum", "max"]).rename(
+            columns={"sum": "seconds", "max": "max_seconds"}
+        )
+        res["peak_memory"] = g.peak_memory.max()
+        for c in counters:
+            res[c] = g[c].sum().astype(int)
+
+        return res
+
+
+def _active() -> list[Recorder]:
+    with _RECORDERS_LOCK:
+        return list(_RECORDERS)
+
+
+def _fold_peak() -> None:
+    """Fold the traced peak into the traced open spans and reset it,
+    for a new span to start from. Call with `_SPANS_LOCK` held.
+    """
+    _, peak = tracemalloc.get_traced_memory()
+    for s in _TRACED:
+        s["_peak"] = max(s["_peak"], peak)
+    if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+        tracemalloc.reset_peak()
+
+
+@contextlib.contextmanager
+def record(callback=None, *, memory=True):
+    """Record spans and counters while in the block, yielding the `Recorder`.
+    See `Recorder` for the parameters.
+    """
+    rec = Recorder(callback, memory=memory)
+    started_tracing = False
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+    with _RECORDERS_LOCK:
+        _RECORDERS.append(rec)
+    try:
+        yield rec
+    finally:
+        with _RECORDERS_LOCK:
+            _RECORDERS.remove(rec)
+        if started_tracing:
+            tracemalloc.stop()
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """Record the block as stage `name` (with extra `attrs`) in the active recorders."""
+    recs = _active()
+    if not recs:
+        yield
+        return
+
+    parents = _OPEN.get()
+    s = {
+        "name": name,
+        "parent": parents[-1]["name"] if parents else None,
+        "thread": threading.current_thread().name,
+        "counters": {},
+        "_peak": 0,
+        **attrs,
+    }
+    trace = tracemalloc.is_tracing() and any(r.memory for r in recs)
+    if trace:
+        with _SPANS_LOCK:
+            _fold_peak()
+            _TRACED.append(s)
+    token = _OPEN.set(parents + (s,))
+    tic = time.perf_counter()
+    try:
+        yield
+    finally:
+        toc = time.perf_counter()
+        _OPEN.reset(token)
+        with _SPANS_LOCK:
+            peak = s.pop("_peak")
+            if trace:
+                _TRACED[:] = [x for x in _TRACED if x is not s]
+                # Peak traced memory (of the whole process) during the span
+                s["peak_memory"] = max(peak, tracemalloc.get_traced_memory()[1])
+            s["counters"] = dict(s["counters"])
+        s["seconds"] = toc - tic
+        for rec in recs:
+            rec._add(dict(s, start=tic - rec._t0))
+
+
+def count(name: str, n: int = 1) -> None:
+    """Add `n` to counter `name` of the spans open in the current context
+    and the totals of the active recorders.
+    """
+    recs = _active()
+    if not recs:
+        return
+
+    with _SPANS_LOCK:
+        for s in _OPEN.get():
+            s["counters"][name] = s["counters"].get(name, 0) + n
+    for rec in recs:
+        rec._count(name, n)
+
+
+def wrap(func):
+    """Wrap `func` to run in (a copy of) the current context,
+    so that spans in it are nested in the currently open ones, even in another thread.
+    """
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return ctx.copy().run(func, *args, **kwargs)
+
+    return wrapper
+
+
+def submit(pool, func, *args, **kwargs):
+    """Like ``pool.submit``, but running `func` in the current context (see `wrap`)."""
+    return pool.submit(contextvars.copy_context().run, func, *args, **kwargs)
@@ -0,0 +1,216 @@
+"""
+Interpolate station data directly to the SWAMP grid.
+
+The parts that depend only on the station locations
+(RBF system factorization, neighbor weight matrices) are computed once per station set
+and kept in memory, so interpolating other fields (days, depths)
+for the same stations is just a solve and/or matrix product.
+
+Like MetPy's `interpolate_to_grid`, which was used previously,
+distances are Euclidean in degrees of longitude and latitude.
+"""
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import xarray as xr
+
+METHODS = ("rbf", "nearest", "barnes", "cressman")
+
+_PARAMS = {
+    "rbf": {"function", "smooth"},
+    "nearest": set(),
+    "barnes": {"search_radius", "minimum_neighbors", "gamma", "kappa_star"},
+    "cressman": {"search_radius", "minimum_neighbors"},
+}
+"""Valid settings for each method."""
+
+_RBF_FUNCTIONS = {
+    "linear": lambda r: r,
+    "cubic": lambda r: r**3,
+    "thin_plate": lambda r: np.where(r > 0, r**2 * np.log(np.where(r > 0, r, 1)), 0),
+}
+
+_INTERPOLATORS: OrderedDict = OrderedDict()
+"""In-memory cache of interpolator state, by key (see `_interpolator_key`),
+most recently used last.
+"""
+
+MAX_INTERPOLATORS = 8
+"""Maximum number of cached interpolators (station set + settings)."""
+
+_BLOCK = 65_536
+"""Number of grid points per block when evaluating the RBF."""
+
+
+def _grid_points():
+    """Grid cell center lon and lat, flattened (lat-major)."""
+    from .calc import _get_grid
+
+    grid = _get_grid()
+    lat, lon = np.meshgrid(grid.lat.values, grid.lon.values, indexing="ij")
+    return lon.ravel(), lat.ravel()
+
+
+def _average_spacing(xy):
+    """Mean distance from each station to its nearest neighbor."""
+    from scipy.spatial import cKDTree
+
+    d, _ = cKDTree(xy).query(xy, k=2)
+    return d[:, 1].mean()
+
+
+def _interpolator_key(x, y, method, params):
+    h = hashlib.sha1(method.encode())
+    h.update(repr(sorted(params.items())).encode())
+    for a in (x, y):
+        a = np.ascontiguousarray(a, dtype=np.float64)
+        h.update(str(a.shape).encode())
+        h.update(a.tobytes())
+    return h.hexdigest()
+
+
+def _build(x, y, method, params):
+    """Compute the station-geometry-dependent interpolator state."""
+    from scipy import sparse
+    from scipy.spatial import cKDTree
+
+    xy = np.column_stack([x, y])
+    n = len(xy)
+
+    # Only grid points within the station bounding box get values
+    gx, gy = _grid_points()
+    (inside,) = np.nonzero((gx >= x.min()) & (gx <= x.max()) & (gy >= y.min()) & (gy <= y.max()))
+    pts = np.column_stack([gx[inside], gy[inside]])
+    state = {"method": method, "inside": inside}
+
+    if method == "rbf":
+        from scipy.linalg import lu_factor
+        from scipy.spatial.distance import cdist
+
+        function = params.get("function", "linear")
+        if function not in _RBF_FUNCTIONS:
+            raise ValueError(f"invalid RBF function {function!r}. Valid: {tuple(_RBF_FUNCTIONS)}")
+        phi = _RBF_FUNCTIONS[function]
+        a = phi(cdist(xy, xy)) - np.eye(n) * params.get("smooth", 0)  # like `scipy.interpolate.Rbf`
+        state.update(lu=lu_factor(a), xy=xy, pts=pts, phi=phi)
+
+    elif method == "nearest":
+        _, j = cKDTree(xy).query(pts)
+        state["w"] = sparse.csr_matrix(
+            (np.ones(len(pts)), (np.arange(len(pts)), j)), shape=(len(pts), n)
+        )
+        state["ok"] = np.ones(len(pts), dtype=bool)
+
+    else:  # barnes, cressman
+        spacing = _average_spacing(xy)
+        r = params.get("search_radius")
+        if r is None:
+            r = 5 * spacing
+        nb = cKDTree(xy).sparse_distance_matrix(cKDTree(pts), r, output_type="ndarray")
+        d2 = nb["v"] ** 2
+        if method == "barnes":
+            kappa = params.get("kappa_star", 5.052) * (2 * spacing / np.pi) ** 2
+            w = np.exp(-d2 / (kappa * params.get("gamma", 0.25)))
+        else:
+            w = (r**2 - d2) / (r**2 + d2)
+        w = sparse.csr_matrix((w, (nb["j"], nb["i"])), shape=(len(pts), n))
+        count = np.bincount(nb["j"], minlength=len(pts))
+        ok = count >= params.get("minimum_neighbors", 3)
+        wsum = np.asarray(w.sum(axis=1)).ravel()
+        state["w"] = sparse.diags(np.where(ok, 1 / np.where(wsum > 0, wsum, 1), 0)) @ w
+        state["ok"] = ok
+
+    return state
+
+
+def _apply(state, v):
+    """Interpolate station values `v` to the grid points inside the station bounding box."""
+    if state["method"] == "rbf":
+        from scipy.linalg import lu_solve
+        from scipy.spatial.distance import cdist
+
+        coef = lu_solve(state["lu"], v)
+        pts = state["pts"]
+        res = np.empty(len(pts))
+        for a in range(0, len(pts), _BLOCK):
+            res[a : a + _BLOCK] = state["phi"](cdist(pts[a : a + _BLOCK], state["xy"])) @ coef
+    else:
+        res = state["w"] @ v
+        res[~state["ok"]] = np.nan
+
+    return res
+
+
+def get_interpolator(x, y, *, method="rbf", **params):
+    """Get the interpolator state for stations at `x` (lon), `y` (lat),
+    computing it if not cached.
+    """
+    if method not in METHODS:
+        raise ValueError(f"invalid interpolation method {method!r}. Valid: {METHODS}")
+    invalid = set(params) - _PARAMS[method]
+    if invalid:
+        raise ValueError(
+            f"invalid setting(s) {sorted(invalid)} for method {method!r}. "
+            f"Valid: {sorted(_PARAMS[method])}"
+        )
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    key = _interpolator_key(x, y, method, params)
+    state = _INTERPOLATORS.get(key)
+    if state is not None:
+        _INTERPOLATORS.move_to_end(key)
+        return state
+
+    state = _build(x, y, method, params)
+    _INTERPOLATORS[key] = state
+    while len(_INTERPOLATORS) > MAX_INTERPOLATORS:
+        _INTERPOLATORS.popitem(last=False)
+
+    return state
+
+
+def to_grid(x, y, v, *, method="rbf", **params):
+    """Interpolate station values `v` at `x` (lon), `y` (lat) to the SWAMP grid.
+
+    Stations with NaN `x`, `y` or `v` are dropped.
+    Grid points outside the bounding box of the stations are NaN.
+
+    Parameters
+    ----------
+    method : {'rbf', 'nearest', 'barnes', 'cressman'}
+        - 'rbf': radial basis function interpolation (exact at the stations).
+          Settings: `function` ('linear' (default), 'cubic', 'thin_plate')
+          and `smooth` (default 0).
+        - 'nearest': value of the nearest station.
+        - 'barnes', 'cressman': weighted average of the stations within `search_radius`
+          (default: 5 times the average station spacing),
+          NaN where there are fewer than `minimum_neighbors` (default 3).
+          Barnes settings: `gamma` (default 0.25) and `kappa_star` (default 5.052).
+    **params
+        Settings for `method` (see above).
+        The interpolator is cached for the station set and settings.
+
+    Returns
+    -------
+    xarray.DataArray
+        Dims (lat, lon).
+    """
+    from .calc import _NLAT, _NLON, _get_grid
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    keep = np.isfinite(x) & np.isfinite(y) & np.isfinite(v)
+    x, y, v = x[keep], y[keep], v[keep]
+    if x.size == 0:
+        raise ValueError("no valid station data to interpolate")
+
+    state = get_interpolator(x, y, method=method, **params)
+    res = np.full(_NLAT * _NLON, np.nan)
+    res[state["inside"]] = _apply(state, v)
+
+    return xr.DataArray(res.reshape(_NLAT, _NLON), coords=_get_grid().coords, dims=("lat", "lon"))
@@ -3,105 +3,689 @@ Download the SWAMP inputs.
 """
 from __future__ import annotations
 
+import contextlib
 import datetime
+import io
+import json
+import os
 import re
+import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import urlsplit
 
 import numpy as np
 import pandas as pd
 import requests
 import xarray as xr
+from requests.adapters import HTTPAdapter
+
+from . import instrument
+from .memcache import MemoryCache
 
 CACHE_DIR = Path(__file__).parent / "cache"
 
 assert CACHE_DIR.is_dir()
 
+CRN_BASE_URL = "https://www.ncei.noaa.gov/pub/data/uscrn/products/daily01"
+PRISM_BASE_URL = "https://ftp.prism.oregonstate.edu/daily/ppt"
+ALEXI_BASE_URL = "https://geo.nsstc.nasa.gov/SPoRT/outgoing/crh/4ecostress"
+"""Remote data locations (directory trees), read by the loaders on each call."""
 
-def get_crn(days, *, use_cache=True):
-    """Get daily soil (and vegetation?) CRN data for `days`.
+ALEXI_ARCHIVE: Path | None = None
+"""Default local directory of yearly ALEXI ET archives for `get_alexi`
+(see `swampy.archive`). None to use only the server and per-day cache."""
 
-    Info: https://www.ncei.noaa.gov/access/crn/qcdatasets.html
+MAX_WORKERS = 8
+"""Default number of concurrent downloads (per loader call)."""
 
-    Data: https://www.ncei.noaa.gov/pub/data/uscrn/products/daily01/
+_POOL_MAXSIZE = 32
+"""Max number of keep-alive connections kept per host."""
+
+_SESSIONS: dict[str, requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+MEMORY_CACHE = MemoryCache(max_bytes=2**30)
+"""In-memory cache of loaded days, keyed on (source, day, variable), shared by the loaders.
+Adjust the budget with ``MEMORY_CACHE.max_bytes`` (0 to disable)
+and check its effectiveness with ``MEMORY_CACHE.stats()``.
+"""
+
+
+def _get_session(url: str) -> requests.Session:
+    """Get the shared (keep-alive) session for the host of `url`."""
+    host = urlsplit(url).netloc
+    with _SESSIONS_LOCK:
+        s = _SESSIONS.get(host)
+        if s is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_POOL_MAXSIZE)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _SESSIONS[host] = s
+
+    return s
+
+
+def _get(url: str, **kwargs) -> requests.Response:
+    """GET `url` using the shared session for its host."""
+    with instrument.span("download", url=url):
+        r = _get_session(url).get(url, **kwargs)
+        instrument.count("requests")
+        instrument.count("bytes_downloaded", len(r.content))
+
+    return r
+
+
+def _map_threaded(func, items, *, max_workers=None):
+    """Apply `func` to each of `items` in a bounded thread pool, preserving order."""
+    items = list(items)
+    if max_workers is None:
+        max_workers = MAX_WORKERS
+    if max_workers < 1:
+        raise ValueError(f"`max_workers` must be at least 1, got {max_workers!r}")
+
+    if max_workers == 1 or len(items) <= 1:
+        return [func(x) for x in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(instrument.wrap(func), items))
+
+
+def _tmp_path(fp: Path) -> Path:
+    """Temporary path to write `fp` to before `os.replace`-ing it into place,
+    unique to this process and thread.
     """
-    days = pd.DatetimeIndex(days)
+    return fp.with_name(f".{fp.name}.{os.getpid()}.{threading.get_ident()}.tmp")
 
-    # Get metadata
-    # "This file contains the following three lines: Field Number, Field Name and Unit of Measure."
-    base_url = "https://www.ncei.noaa.gov/pub/data/uscrn/products/daily01"
-    r = requests.get(
-        f"{base_url}/headers.txt",
-    )
+
+@contextlib.contextmanager
+def _file_lock(fp: Path):
+    """Hold an exclusive lock on lock file `fp`, across processes (where `fcntl` is available)
+    and threads, for read-modify-write updates of cache files.
+    """
+    try:
+        import fcntl
+    except ImportError:  # (Windows)
+        fcntl = None
+
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    with open(fp, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+LISTING_TTL = 6 * 3600
+"""Seconds after which a cached remote directory listing is considered stale."""
+
+_LISTING_TTL_PAST = 30 * 86400
+"""Seconds after which listings for years that are over (and past PRISM's provisional period)
+are considered stale."""
+
+_LISTINGS_LOCK = threading.Lock()
+_LISTINGS_REFRESHING: set[str] = set()
+
+
+def _listing_ttl(year) -> float:
+    return _LISTING_TTL_PAST if int(year) < datetime.date.today().year - 1 else LISTING_TTL
+
+
+def _listings_path() -> Path:
+    return CACHE_DIR / "index.json"
+
+
+def _read_listings() -> dict:
+    try:
+        with open(_listings_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _fetch_listing(url: str, pattern) -> list[str]:
+    """Fetch directory page `url` and store its `pattern` matches in the listing index.
+    `pattern` can also be a function that parses the page text to a list.
+    """
+    r = _get(url)
     r.raise_for_status()
-    lines = r.text.splitlines()
-    assert len(lines) == 3
-    nums = lines[0].split()
-    columns = lines[1].split()
-    assert len(nums) == len(columns)
-    assert nums == [str(i + 1) for i in range(len(columns))]
+    items = pattern(r.text) if callable(pattern) else re.findall(pattern, r.text)
+    fp = _listings_path()
+    with _LISTINGS_LOCK, _file_lock(fp.with_suffix(".lock")):
+        # (re-read under the lock, so that updates by other processes are kept)
+        listings = _read_listings()
+        listings[url] = {"time": datetime.datetime.now().timestamp(), "items": items}
+        tmp = _tmp_path(fp)
+        with open(tmp, "w") as f:
+            json.dump(listings, f)
+        os.replace(tmp, fp)
+
+    return items
+
+
+def _refresh_listing_background(url: str, pattern) -> None:
+    with _LISTINGS_LOCK:
+        if url in _LISTINGS_REFRESHING:
+            return
+        _LISTINGS_REFRESHING.add(url)
+
+    def f():
+        try:
+            _fetch_listing(url, pattern)
+        except requests.RequestException:
+            pass  # try again next time
+        finally:
+            with _LISTINGS_LOCK:
+                _LISTINGS_REFRESHING.discard(url)
+
+    threading.Thread(target=f, name="swampy-listing-refresh", daemon=True).start()
+
+
+def _listing(url: str, pattern, *, ttl: float | None = None, need=None) -> list[str]:
+    """Get the `pattern` matches (e.g. file names) of remote directory page `url`,
+    using the persistent listing index in the cache directory.
+
+    - Fresh (younger than `ttl`, default `LISTING_TTL`) listings are returned as is.
+    - Stale listings are returned as is, and refreshed in a background thread.
+    - If the listing is missing, or doesn't satisfy `need` (function of the items),
+      the page is fetched. If that fails (e.g. offline), a stale listing is used if available.
+    """
+    if ttl is None:
+        ttl = LISTING_TTL
+    entry = _read_listings().get(url)
+    if entry is not None and (need is None or need(entry["items"])):
+        if datetime.datetime.now().timestamp() - entry["time"] > ttl:
+            _refresh_listing_background(url, pattern)
+        return entry["items"]
+
+    try:
+        return _fetch_listing(url, pattern)
+    except requests.RequestException as e:
+        if entry is None:
+            raise
+        warnings.warn(
+            f"using cached listing of {url}, since it could not be fetched ({e})", stacklevel=3
+        )
+        return entry["items"]
+
+
+_CRN_SITE_COLS = [
+    "WBANNO",
+    "LST_DATE",
+    "CRX_VN",
+    "LONGITUDE",
+    "LATITUDE",
+]
+
+
+def _crn_cache_dir(year) -> Path:
+    """Directory of the CRN cache partitions (one Parquet file per month) for `year`."""
+    return CACHE_DIR / "CRN" / str(year)
+
+
+def _crn_cache_lock_path(year) -> Path:
+    """Lock file for writing the CRN cache for `year` (see `_file_lock`)."""
+    return CACHE_DIR / "CRN" / f"{year}.lock"
+
+
+def _write_crn_cache(year, df: pd.DataFrame, files: dict | None = None) -> None:
+    """Write `df` (one year of CRN data) to the partitioned cache, replacing any existing.
+
+    `files` is the per-station-file download state used for incremental refreshes.
+    """
+    import shutil
+
+    dst = _crn_cache_dir(year)
+    tmp = _tmp_path(dst)
+    old = tmp.with_suffix(".old")
+    tmp.mkdir(parents=True)
+    try:
+        for month, df_m in df.groupby(df.LST_DATE.dt.month):
+            df_m.reset_index(drop=True).to_parquet(tmp / f"{month:02d}.parquet", index=False)
+        with open(tmp / "_files.json", "w") as f:
+            json.dump(files or {}, f)
+
+        # Swap in the complete year at once so that a partial write is never seen as cached
+        with _file_lock(_crn_cache_lock_path(year)):
+            if dst.exists():
+                os.replace(dst, old)
+            os.replace(tmp, dst)
+    finally:
+        for d in [tmp, old]:
+            if d.exists():
+                shutil.rmtree(d)
+
+
+def _update_crn_cache(
+    year, df_new: pd.DataFrame | None, replace_stations=(), files=None, replace_from=None
+) -> None:
+    """Merge new rows into the cached partitions for `year`.
+
+    Existing rows for `replace_stations` are dropped first (all months),
+    as are those for the stations in `replace_from` (``{WBANNO: date}``) from that date on;
+    otherwise rows for the same station and date are overwritten.
+    """
+    d = _crn_cache_dir(year)
+    replace_stations = set(replace_stations)
+    replace_from = replace_from or {}
+    if df_new is None:
+        df_new = pd.DataFrame({"WBANNO": [], "LST_DATE": pd.to_datetime([])})
+
+    with _file_lock(_crn_cache_lock_path(year)):
+        months = set(df_new.LST_DATE.dt.month)
+        if replace_stations:
+            months |= {int(fp.stem) for fp in d.glob("[0-9][0-9].parquet")}
+        if replace_from:
+            first = min(replace_from.values())
+            months |= {
+                int(fp.stem)
+                for fp in d.glob("[0-9][0-9].parquet")
+                if pd.Timestamp(int(year), int(fp.stem), 1) >= first.replace(day=1)
+            }
+
+        for month in sorted(months):
+            fp = d / f"{month:02d}.parquet"
+            df_m = df_new[df_new.LST_DATE.dt.month == month]
+            if fp.is_file():
+                df_old = pd.read_parquet(fp)
+                if replace_stations:
+                    df_old = df_old[~df_old.WBANNO.isin(replace_stations)]
+                if replace_from:
+                    since = df_old.WBANNO.map(replace_from)
+                    df_old = df_old[~(df_old.LST_DATE >= since)]
+                df_m = (
+                    pd.concat([df_old, df_m], ignore_index=True)
+                    .drop_duplicates(subset=["WBANNO", "LST_DATE"], keep="last")
+                    .sort_values(["WBANNO", "LST_DATE"], kind="stable")
+                )
+            tmp = _tmp_path(fp)
+            df_m.reset_index(drop=True).to_parquet(tmp, index=False)
+            os.replace(tmp, fp)
+
+        if files is not None:
+            tmp = _tmp_path(d / "_files.json")
+            with open(tmp, "w") as f:
+                json.dump(files, f)
+            os.replace(tmp, d / "_files.json")
+
+
+def _read_crn_files_state(year) -> dict:
+    fp = _crn_cache_dir(year) / "_files.json"
+    if not fp.is_file():  # e.g. migrated from the CSV cache
+        return {}
+    with open(fp) as f:
+        return json.load(f)
+
+
+def _read_crn_cache(year, days: pd.DatetimeIndex, columns=None) -> pd.DataFrame:
+    """Read CRN data for `days` (all in `year`) from the cache,
+    loading only the month partitions and `columns` needed.
+    """
+    d = _crn_cache_dir(year)
+    days = days[days.year == int(year)].floor("D").unique()
+    filters = [("LST_DATE", "in", list(days))]
+    instrument.count("disk_cache_hits")
+    dfs = []
+    for month in days.month.unique():
+        fp = d / f"{month:02d}.parquet"
+        if not fp.is_file():  # no data for this month (e.g. in the future)
+            continue
+        dfs.append(pd.read_parquet(fp, columns=columns, filters=filters))
+
+    if not dfs:
+        return pd.DataFrame(columns=columns)
+
+    return pd.concat(dfs, ignore_index=True)
+
+
+def _migrate_crn_csv_cache(year) -> None:
+    """Convert an old-style ``CRN_<year>.csv.gz`` cache file to the partitioned format."""
+    fp = CACHE_DIR / f"CRN_{year}.csv.gz"
+    if not fp.is_file() or _crn_cache_dir(year).is_dir():
+        return
+
+    df = pd.read_csv(fp, index_col=0, parse_dates=["LST_DATE"])
+    _write_crn_cache(year, df)
+    fp.unlink()
+
+
+def _parse_crn_text(text: str, columns) -> pd.DataFrame:
+    with instrument.span("crn.parse"):
+        return pd.read_csv(
+            io.StringIO(text),
+            delim_whitespace=True,
+            names=columns,
+            parse_dates=["LST_DATE"],
+            infer_datetime_format=True,
+            na_values=[-99999, -9999.0],
+        )
+
+
+CRN_REVISION_MONTHS = 2
+"""Number of recent months (including the current one) of the station files
+re-requested by `get_crn` refreshes, since recent rows may have been revised in place."""
+
+CRN_FULL_REFRESH_DAYS = 30
+"""Station files last downloaded in full longer ago than this
+are downloaded in full again by `get_crn` refreshes (catching revisions of older rows)."""
+
+
+def _crn_revision_window_start() -> pd.Timestamp:
+    """First day of the oldest month re-requested by refreshes (see `CRN_REVISION_MONTHS`)."""
+    return (pd.Timestamp.today().to_period("M") - (CRN_REVISION_MONTHS - 1)).start_time
+
+
+def _crn_month_offsets(content: bytes, base: int = 0) -> dict[str, list]:
+    """Byte offset (plus `base`) and station/date prefix of the first row of each month
+    (``YYYYMM``) in station file `content`.
+    """
+    res = {}
+    pos = 0
+    for line in content.splitlines(keepends=True):
+        m = re.match(rb"\s*\S+\s+([0-9]{6})[0-9]{2}", line)
+        if m is not None:
+            res.setdefault(m.group(1).decode(), [base + pos, m.group(0).decode()])
+        pos += len(line)
+
+    return res
+
+
+def _crn_file_state(
+    r: requests.Response, *, size: int, content: bytes, months: dict, full_time: float
+) -> dict:
+    """State needed to later request only the recent part of a station file."""
+    # The last line is re-requested to confirm that the file was only appended to
+    tail = content[content.rstrip(b"\n").rfind(b"\n") + 1 :]
+    return {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "size": size,
+        "tail": tail.decode(),
+        "months": months,
+        "full_time": full_time,
+    }
+
+
+def _fetch_crn_file(url: str, columns, state: dict | None = None):
+    """Download CRN station file `url`.
+
+    If `state` (from a previous download) is passed, make a conditional range request
+    for only the rows of the recent months (see `CRN_REVISION_MONTHS`),
+    or, if the file has none, the bytes added since then.
+    The range is only used if it still starts at a row boundary
+    (so the older rows have kept their length);
+    otherwise, or if the last full download is older than `CRN_FULL_REFRESH_DAYS`,
+    the whole file is downloaded.
+
+    NOTE: Revisions of rows older than the recent months that keep the file size
+    are only picked up by the periodic full download.
+
+    Returns
+    -------
+    mode : {'full', 'recent', 'append', 'unchanged'}
+        With 'recent', `df` replaces the station's rows from its first date on.
+    df : pandas.DataFrame or None
+    state : dict
+    """
+    print(url)
+    now = datetime.datetime.now().timestamp()
+    if (
+        state is not None
+        and now - state.get("full_time", 0) < CRN_FULL_REFRESH_DAYS * 86400
+        and "months" in state
+    ):
+        window = _crn_revision_window_start().strftime(r"%Y%m")
+        recent = sorted((ym, v) for ym, v in state["months"].items() if ym >= window)
+        if recent:
+            offset, prefix = recent[0][1]
+            expect = prefix.encode()
+        else:
+            expect = state["tail"].encode()
+            offset = state["size"] - len(expect)
+        headers = {"Range": f"bytes={offset}-"}
+        if state["etag"]:
+            headers["If-None-Match"] = state["etag"]
+        elif state["last_modified"]:
+            headers["If-Modified-Since"] = state["last_modified"]
+        r = _get(url, headers=headers)
+        if r.status_code == 304:
+            return "unchanged", None, state
+        if r.status_code == 206 and r.content.startswith(expect):
+            months = {ym: v for ym, v in state["months"].items() if not recent or ym < recent[0][0]}
+            for ym, v in _crn_month_offsets(r.content, offset).items():
+                months.setdefault(ym, v)
+            new_state = _crn_file_state(
+                r,
+                size=offset + len(r.content),
+                content=r.content,
+                months=months,
+                full_time=state["full_time"],
+            )
+            if recent:
+                return "recent", _parse_crn_text(r.text, columns), new_state
+            new = r.content[len(expect) :]
+            if not new.strip():
+                return "unchanged", None, new_state
+            return "append", _parse_crn_text(new.decode(), columns), new_state
+        if r.status_code != 200:
+            # Range not satisfiable (file shrank) or the old part of the file has changed
+            r = _get(url)
+    else:
+        r = _get(url)
 
-    # Get available years from the main page
-    # e.g. `>2000/<`
-    r = requests.get(f"{base_url}/")
     r.raise_for_status()
-    available_years: list[str] = re.findall(r">([0-9]{4})/?<", r.text)
+    new_state = _crn_file_state(
+        r,
+        size=len(r.content),
+        content=r.content,
+        months=_crn_month_offsets(r.content),
+        full_time=now,
+    )
+
+    return "full", _parse_crn_text(r.text, columns), new_state
+
+
+def _refresh_crn_cache(year, fns, columns, *, max_workers=None) -> None:
+    """Incrementally update the cache for `year` with new rows from station files `fns`."""
+    base_url = CRN_BASE_URL
+    files = _read_crn_files_state(year)
+    res = _map_threaded(
+        lambda fn: _fetch_crn_file(f"{base_url}/{year}/{fn}", columns, state=files.get(fn)),
+        fns,
+        max_workers=max_workers,
+    )
+
+    dfs_new = []
+    replace_stations = set()
+    replace_from = {}
+    for fn, (mode, df, state) in zip(fns, res):
+        files[fn] = state
+        if mode == "full":
+            # New station file or one whose older rows have changed
+            replace_stations.update(df.WBANNO.unique())
+        elif mode == "recent" and not df.empty:
+            # (possibly revised) rows of the recent months
+            for wbanno, date in df.groupby("WBANNO").LST_DATE.min().items():
+                replace_from[wbanno] = date
+        if df is not None:
+            dfs_new.append(df)
+
+    if dfs_new:
+        df_new = pd.concat(dfs_new, ignore_index=True)
+    else:
+        df_new = None
+    _update_crn_cache(year, df_new, replace_stations, files=files, replace_from=replace_from)
 
+
+def _load_crn(days, *, base_url, all_columns, columns, use_cache, refresh, max_workers):
+    """Load CRN data for `days` from the disk cache, downloading as needed.
+    See `get_crn`.
+    """
     # Get files
-    # TODO: parallelize using Dask or joblib
     dfs_per_year = []
     years = days.year.astype(str).unique()
     for year in years:
-        if year not in available_years:
-            raise ValueError(f"year {year} not in detected available CRN years {available_years}")
+        _migrate_crn_csv_cache(year)
+        is_cached = _crn_cache_dir(year).is_dir()
 
-        cached_fp = CACHE_DIR / f"CRN_{year}.csv.gz"
-        is_cached = cached_fp.is_file()
+        if not is_cached:
+            # Check available years from the main page
+            # e.g. `>2000/<`
+            available_years = _listing(
+                f"{base_url}/", r">([0-9]{4})/?<", need=lambda items: year in items
+            )
+            if year not in available_years:
+                raise ValueError(
+                    f"year {year} not in detected available CRN years {available_years}"
+                )
 
-        if not is_cached or not use_cache:
+        if not is_cached or not use_cache or refresh:
             # Get filenames from the year page
             # e.g. `>CRND0103-2020-TX_Palestine_6_WNW.txt<`
             url = f"{base_url}/{year}/"
-            r = requests.get(url)
-            r.raise_for_status()
-            fns = re.findall(r">(CRN[a-zA-Z0-9\-_]*\.txt)<", r.text)
+            fns = _listing(
+                url, r">(CRN[a-zA-Z0-9\-_]*\.txt)<", ttl=_listing_ttl(year) if use_cache else 0
+            )
             if not fns:
                 warnings.warn(f"no CRN files found for year {year} (url {url})", stacklevel=2)
 
-            dfs_per_file = []
-            for fn in fns:
-                url = f"{base_url}/{year}/{fn}"
-                print(url)
-                df = pd.read_csv(
-                    url,
-                    delim_whitespace=True,
-                    names=columns,
-                    parse_dates=["LST_DATE"],
-                    infer_datetime_format=True,
-                    na_values=[-99999, -9999.0],
-                )
-                dfs_per_file.append(df)
-            df = pd.concat(dfs_per_file)
+        if not is_cached or not use_cache:
+            res = _map_threaded(
+                lambda fn: _fetch_crn_file(f"{base_url}/{year}/{fn}", all_columns),
+                fns,
+                max_workers=max_workers,
+            )
+            df = pd.concat([df for _, df, _ in res])
+
+            if not is_cached:
+                files = {fn: state for fn, (_, _, state) in zip(fns, res)}
+                _write_crn_cache(year, df, files)  # ~ 1 MB
+
+            df = df.loc[df.LST_DATE.isin(days.floor("D")), columns]
         else:
-            # Read from cache
-            df = pd.read_csv(cached_fp, index_col=0, parse_dates=["LST_DATE"])
+            if refresh:
+                _refresh_crn_cache(year, fns, all_columns, max_workers=max_workers)
 
-        if not is_cached:
-            df.to_csv(cached_fp)  # ~ 2 MB
+            # Read from cache
+            df = _read_crn_cache(year, days, columns=columns)
 
         dfs_per_year.append(df)
 
+    return pd.concat(dfs_per_year)
+
+
+_CRN_HEADERS: dict[str, list[str]] = {}
+"""CRN column names, by base URL."""
+
+
+def _parse_crn_headers(text: str) -> list[str]:
+    # "This file contains the following three lines: Field Number, Field Name and Unit of Measure."
+    lines = text.splitlines()
+    assert len(lines) == 3
+    nums = lines[0].split()
+    all_columns = lines[1].split()
+    assert len(nums) == len(all_columns)
+    assert nums == [str(i + 1) for i in range(len(all_columns))]
+    assert set(_CRN_SITE_COLS) < set(all_columns)
+
+    return all_columns
+
+
+def _crn_all_columns(base_url: str) -> list[str]:
+    """Get the CRN column names from ``headers.txt`` (once per base URL)."""
+    all_columns = _CRN_HEADERS.get(base_url)
+    if all_columns is None:
+        all_columns = _listing(f"{base_url}/headers.txt", _parse_crn_headers, ttl=_LISTING_TTL_PAST)
+        _CRN_HEADERS[base_url] = all_columns
+
+    return all_columns
+
+
+def get_crn(days, *, columns=None, use_cache=True, refresh=False, max_workers=None):
+    """Get daily soil (and vegetation?) CRN data for `days`.
+
+    Info: https://www.ncei.noaa.gov/access/crn/qcdatasets.html
+
+    Data: https://www.ncei.noaa.gov/pub/data/uscrn/products/daily01/
+
+    Station files are downloaded concurrently, at most `max_workers` at a time
+    (default: `MAX_WORKERS`), reusing keep-alive connections.
+    The data are cached as Parquet, partitioned by year and month,
+    so that only the months (and `columns`) needed are read back.
+    Cached years are read without contacting the server
+    (``headers.txt`` and the directory listings are cached too).
+
+    Parameters
+    ----------
+    columns : list of str, optional
+        Data columns to return (e.g. ``["SOIL_MOISTURE_20_DAILY"]``),
+        in addition to the site columns (station ID, date, location).
+        Default: all.
+    use_cache : bool
+        Read from the cache if the year has been cached.
+        If false, re-download all station files for the year.
+    refresh : bool
+        Update cached years incrementally before reading,
+        requesting only the rows of the last `CRN_REVISION_MONTHS` months of each station file
+        (or the part added since it was last downloaded) with conditional range requests,
+        and the whole file every `CRN_FULL_REFRESH_DAYS` days.
+        Useful for the current year.
+    """
+    days = pd.DatetimeIndex(days)
+
+    # Get metadata
+    base_url = CRN_BASE_URL
+    all_columns = _crn_all_columns(base_url)
+
+    if columns is None:
+        data_cols = [c for c in all_columns if c not in _CRN_SITE_COLS]
+    else:
+        data_cols = [c for c in columns if c not in _CRN_SITE_COLS]
+        unknown = set(data_cols) - set(all_columns)
+        if unknown:
+            raise ValueError(f"unknown CRN columns {sorted(unknown)}. Valid: {all_columns}")
+    columns = _CRN_SITE_COLS + data_cols
+
+    # Days already in memory (the site columns and each data column are stored separately)
+    day_index = days.floor("D").unique()
+    dfs_per_day = {}
+    if use_cache and not refresh:
+        for day in day_index:
+            site = MEMORY_CACHE.get(("crn", day, "_site"))
+            if site is None:
+                continue
+            data = [MEMORY_CACHE.get(("crn", day, c)) for c in data_cols]
+            if any(x is None for x in data):
+                continue
+            dfs_per_day[day] = pd.concat([site, *data], axis=1)
+
+    missing_days = day_index[~day_index.isin(list(dfs_per_day))]
+    if len(missing_days) > 0:
+        df = _load_crn(
+            missing_days,
+            base_url=base_url,
+            all_columns=all_columns,
+            columns=columns,
+            use_cache=use_cache,
+            refresh=refresh,
+            max_workers=max_workers,
+        )
+        for day, df_day in df.groupby("LST_DATE", sort=False):
+            df_day = df_day.reset_index(drop=True)
+            MEMORY_CACHE.put(("crn", day, "_site"), df_day[_CRN_SITE_COLS])
+            for c in data_cols:
+                MEMORY_CACHE.put(("crn", day, c), df_day[c])
+            dfs_per_day[day] = df_day
+
     # Combined df
-    site_cols = [
-        "WBANNO",
-        "LST_DATE",
-        "CRX_VN",
-        "LONGITUDE",
-        "LATITUDE",
-    ]
-    assert set(site_cols) < set(df)
-    data_cols = [c for c in df.columns if c not in site_cols]
-    df = pd.concat(dfs_per_year).dropna(subset=data_cols, how="all").reset_index(drop=True)
+    dfs = [dfs_per_day[day] for day in day_index if day in dfs_per_day]
+    df = pd.concat(dfs) if dfs else pd.DataFrame(columns=columns)
+    df = df.dropna(subset=data_cols, how="all").reset_index(drop=True)
     if df.empty:
         warnings.warn("CRN dataframe empty after dropping missing data rows", stacklevel=2)
 
@@ -110,46 +694,237 @@ def get_crn(days, *, use_cache=True):
     df[sm_cols] = df[sm_cols].replace(-99, np.nan)
 
     # Select data at days
-    df = df[df.LST_DATE.isin(days.floor("D"))].reset_index(drop=True)
+    df = (
+        df[df.LST_DATE.isin(days.floor("D"))]
+        .sort_values(["WBANNO", "LST_DATE"], kind="stable")
+        .reset_index(drop=True)
+    )
 
     return df
 
 
+# PRISM grid
+# TODO: the metadata we use here is in the HDR text file, could get from there
+_PRISM_NCOLS = 1405
+_PRISM_NROWS = 621
+_PRISM_NODATA = -9999
+_PRISM_ULXMAP = -125.000000000000
+_PRISM_ULYMAP = 49.916666666667
+_PRISM_XDIM = 0.041666666667  # 2.5 arc minutes, ~ 4 km
+_PRISM_YDIM = 0.041666666667
+
+
+_PRISM_CUBE_MIN_DEAD = 32
+"""Compact the PRISM cube once it has at least this many dead slots
+(and no fewer than live ones), left by replaced days.
+"""
+
+
+def _prism_cube_paths() -> tuple[Path, Path]:
+    """Paths of the PRISM cube cache: the data (float32, C order) and its day index.
+    The data file of a compacted cube is named in the index instead (see `_prism_data_path`).
+    """
+    return CACHE_DIR / "PRISM_ppt_4kmD2.f32", CACHE_DIR / "PRISM_ppt_4kmD2.json"
+
+
+def _prism_cube_lock():
+    """Lock on the PRISM cube (see `_file_lock`), for updating the data and index together."""
+    return _file_lock(CACHE_DIR / "PRISM_ppt_4kmD2.lock")
+
+
+def _read_prism_index() -> dict:
+    """Read the PRISM cube index,
+    ``{"data": data file name, "generation": n, "days": {ymd: [slot, stability]}}``.
+    """
+    data_fp, index_fp = _prism_cube_paths()
+    index = {}
+    if index_fp.is_file():
+        with open(index_fp) as f:
+            index = json.load(f)
+    if "days" not in index:  # not compacted yet (or empty)
+        index = {"data": data_fp.name, "generation": 0, "days": index}
+
+    return index
+
+
+def _write_prism_index(index: dict) -> None:
+    _, index_fp = _prism_cube_paths()
+    tmp = _tmp_path(index_fp)
+    with open(tmp, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp, index_fp)
+
+
+def _prism_data_path(index: dict) -> Path:
+    return CACHE_DIR / index["data"]
+
+
+def _put_prism_day(index: dict, ymd: str, stab: str, arr: np.ndarray) -> None:
+    """Store one day of decoded PRISM data in the cube, and update `index`.
+
+    The day is always appended in a new slot, even if it is already stored,
+    so that arrays previously returned for the day (views of the cube) never change.
+    The old slot is left dead until the cube is compacted (see `_compact_prism_cube`).
+    """
+    data_fp = _prism_data_path(index)
+    assert arr.shape == (_PRISM_NROWS, _PRISM_NCOLS) and arr.dtype == np.float32
+    nbytes = arr.nbytes
+    with open(data_fp, "ab") as f:
+        slot = f.tell() // nbytes
+        f.seek(slot * nbytes)  # drop any partial slot from an interrupted write
+        f.truncate()
+        f.write(arr.tobytes())
+    index["days"][ymd] = [slot, stab]
+
+
+def _compact_prism_cube(index: dict) -> None:
+    """Copy the live slots of the cube to a new data file, in date order, and update `index`.
+
+    Views of the old data file remain valid, since it is only unlinked
+    (on Windows, where open files can't be removed, it is left behind).
+    Must be called under the cube lock, and the index written after.
+    """
+    old_fp = _prism_data_path(index)
+    cube = _open_prism_cube(index)
+    gen = index["generation"] + 1
+    new_fp = CACHE_DIR / f"PRISM_ppt_4kmD2.{gen}.f32"
+    tmp = _tmp_path(new_fp)
+    days = {}
+    with open(tmp, "wb") as f:
+        for slot, ymd in enumerate(sorted(index["days"])):
+            old_slot, stab = index["days"][ymd]
+            f.write(cube[old_slot].tobytes())
+            days[ymd] = [slot, stab]
+    del cube
+    os.replace(tmp, new_fp)
+    index.update(data=new_fp.name, generation=gen, days=days)
+    try:
+        old_fp.unlink()
+    except OSError:
+        pass
+
+
+def _store_prism_day(ymd: str, stab: str, arr: np.ndarray) -> dict:
+    """Store one day in the cube (see `_put_prism_day`) under the cube lock,
+    re-reading the index first, since other processes may have added days,
+    and compact the cube if it has gathered enough dead slots.
+    Returns the updated index.
+    """
+    with _prism_cube_lock():
+        index = _read_prism_index()
+        _put_prism_day(index, ymd, stab, arr)
+        nlive = len(index["days"])
+        ndead = _prism_cube_nslot(index) - nlive
+        if ndead >= max(_PRISM_CUBE_MIN_DEAD, nlive):
+            _compact_prism_cube(index)
+        _write_prism_index(index)
+
+    return index
+
+
+def _prism_cube_nslot(index: dict) -> int:
+    return _prism_data_path(index).stat().st_size // (_PRISM_NROWS * _PRISM_NCOLS * 4)
+
+
+def _open_prism_cube(index: dict) -> np.memmap:
+    nslot = _prism_cube_nslot(index)
+    return np.memmap(
+        _prism_data_path(index),
+        dtype=np.float32,
+        mode="r",
+        shape=(nslot, _PRISM_NROWS, _PRISM_NCOLS),
+    )
+
+
+def _decode_prism_zip(zf_or_fp, fn: str) -> np.ndarray:
+    """Decode the BIL in PRISM zip archive `fn` to a float32 array, with NaN for no-data."""
+    import zipfile
+
+    with instrument.span("prism.unzip"), zipfile.ZipFile(zf_or_fp, "r") as zf:
+        bil_fn = str(Path(fn).with_suffix(".bil"))
+        try:
+            data = zf.read(bil_fn)  # bytes
+        except KeyError:
+            print(f"{bil_fn!r} not found in archive. Archive namelist: {zf.namelist()}")
+            raise
+
+        # BIL metadata (text file)
+        # hdr_fn = str(Path(fn).with_suffix(".hdr"))
+
+    # Read the BIL into an array
+    # https://pymorton.wordpress.com/2016/02/26/plotting-prism-bil-arrays-without-using-gdal/
+    with instrument.span("prism.decode"):
+        arr = np.frombuffer(data, dtype=np.float32).reshape(_PRISM_NROWS, _PRISM_NCOLS).copy()
+        # ^ note: `np.frombuffer()` array is read-only
+        arr[arr == _PRISM_NODATA] = np.nan
+
+    return arr
+
+
 def get_prism(days, *, use_cache=True):
     """Get PRISM precip data.
 
     Info: https://prism.oregonstate.edu/
 
     Data: https://ftp.prism.oregonstate.edu/daily/ppt/
-    """
-    import zipfile
 
+    Decoded days are cached in a single memory-mapped cube (time x lat x lon, float32)
+    along with a day index recording the stability of each day.
+    The returned ``ppt`` is backed by the cube (no copy) when the requested days are
+    stored contiguously, as they are when requested in order.
+    A cached day is re-downloaded once a more stable version becomes available.
+    Re-downloaded days are stored in new slots, so previously returned arrays don't change;
+    the cube is compacted once enough replaced slots have accumulated.
+
+    'Stable' days are also kept in `MEMORY_CACHE` (as views of the cube).
+    The directory listings are cached (see `LISTING_TTL`),
+    and cached 'stable' days are used without checking the server,
+    so runs over cached days work offline.
+    """
     days = pd.DatetimeIndex(days)
 
-    base_url = "https://ftp.prism.oregonstate.edu/daily/ppt"
+    base_url = PRISM_BASE_URL
 
-    # Get available years from the main page
-    # e.g. `>2000/<`
-    r = requests.get(f"{base_url}/")
-    r.raise_for_status()
-    available_years: list[str] = re.findall(r">([0-9]{4})/?<", r.text)
-
-    dss_per_day = []
-    fns_year = {}
     ymds = days.strftime(r"%Y%m%d").unique()
-    for ymd in ymds:
+    in_memory = {}  # ymd -> (data, stability), only stable days
+    if use_cache:
+        for ymd in ymds:
+            x = MEMORY_CACHE.get(("prism", ymd, "ppt"))
+            if x is not None:
+                in_memory[ymd] = x
+    todo = [ymd for ymd in ymds if ymd not in in_memory]
+
+    index = _read_prism_index()
+    stored = index["days"]
+    fns_year = {}
+    for ymd in todo:
         year = ymd[:4]
-        if year not in available_years:
-            raise ValueError(f"year {year} not in detected available years {available_years}")
+        if use_cache and ymd in stored and stored[ymd][1] == "stable":
+            instrument.count("disk_cache_hits")
+            continue  # won't change, so no need to check the server
+
+        def has_day(fns, ymd=ymd):
+            return any(f"_{ymd}_" in fn for fn in fns)
 
         available_fns = fns_year.get(year, None)
-        if available_fns is None:
+        if available_fns is None or not has_day(available_fns):
+            # Check available years from the main page
+            # e.g. `>2000/<`
+            available_years = _listing(
+                f"{base_url}/", r">([0-9]{4})/?<", need=lambda items: year in items
+            )
+            if year not in available_years:
+                raise ValueError(f"year {year} not in detected available years {available_years}")
+
             # Get filenames from the year page
             # e.g. `>PRISM_ppt_stable_4kmD2_20200121_bil.zip<`
             url = f"{base_url}/{year}/"
-            r = requests.get(url)
-            r.raise_for_status()
-            available_fns = re.findall(r">(PRISM_ppt_[a-zA-Z0-9_]*_bil\.zip)<", r.text)
+            available_fns = _listing(
+                url,
+                r">(PRISM_ppt_[a-zA-Z0-9_]*_bil\.zip)<",
+                ttl=_listing_ttl(year) if use_cache else 0,
+                need=has_day,
+            )
             if not available_fns:
                 warnings.warn(f"no PRISM files found for year {year} (url {url})", stacklevel=2)
             fns_year[year] = available_fns
@@ -176,128 +951,427 @@ def get_prism(days, *, use_cache=True):
                 f"note 'stable' PRISM file for {ymd} not found, using {stab!r}", stacklevel=2
             )
 
-        zip_fp = CACHE_DIR / fn
-        is_cached = zip_fp.is_file()
-        if not is_cached or not use_cache:
+        is_cached = ymd in stored and stored[ymd][1] == stab
+        if is_cached and use_cache:
+            instrument.count("disk_cache_hits")
+            continue
+
+        zip_fp = CACHE_DIR / fn  # (zip archives were cached before the cube)
+        if zip_fp.is_file() and use_cache:
+            arr = _decode_prism_zip(zip_fp, fn)
+            zip_fp.unlink()
+        else:
             # Download file
             url = f"{base_url}/{year}/{fn}"
             print(url)
-            r = requests.get(url)
+            r = _get(url)
             r.raise_for_status()
-            with open(zip_fp, "wb") as f:
-                f.write(r.content)
-
-        # Get the BIL from the zip
-        with zipfile.ZipFile(zip_fp, "r") as zf:
-            bil_fn = str(Path(fn).with_suffix(".bil"))
-            try:
-                data = zf.read(bil_fn)  # bytes
-            except KeyError:
-                print(f"{bil_fn!r} not found in archive. Archive namelist: {zf.namelist()}")
-                raise
-
-            # BIL metadata (text file)
-            # hdr_fn = str(Path(fn).with_suffix(".hdr"))
-
-        # Read the BIL into an array
-        # https://pymorton.wordpress.com/2016/02/26/plotting-prism-bil-arrays-without-using-gdal/
-        # TODO: the metadata we use here is in the HDR text file, could get from there
-        prism_ncols = 1405
-        prism_nrows = 621
-        prism_nodata = -9999
-        prism_ulxmap = -125.000000000000
-        prism_ulymap = 49.916666666667
-        prism_xdim = 0.041666666667  # 2.5 arc minutes, ~ 4 km
-        prism_ydim = 0.041666666667
-        prism_array = np.frombuffer(data, dtype=np.float32)  # note: `np.fromfile()` didn't work
-        prism_array = prism_array.reshape(prism_nrows, prism_ncols)
-
-        # Construct Dataset
-        arr = np.where(
-            prism_array == prism_nodata, np.nan, prism_array
-        )  # note: couldn't modify buffer in place
-        lon = prism_ulxmap + np.arange(prism_ncols) * prism_xdim
-        lat = prism_ulymap - np.arange(prism_nrows) * prism_ydim
-        ds = xr.Dataset(
-            data_vars={
-                "ppt": (
-                    ("lat", "lon"),
-                    arr,
-                    {
-                        "long_name": "Precipitation",
-                        "units": "mm",
-                        "description": "Daily total precipitation (rain + melted snow)",
-                    },
-                ),
-                "ppt_stability": (
-                    (),
-                    stab,
-                    {
-                        "long_name": "Stability",
-                        "description": (
-                            "'stable', 'provisional', or 'early', "
-                            "mostly depending on when the data was released"
-                        ),
-                    },
-                ),
-            },
-            coords={
-                "lat": (("lat",), lat),
-                "lon": (("lon",), lon),
-            },
+            arr = _decode_prism_zip(io.BytesIO(r.content), fn)
+
+        index = _store_prism_day(ymd, stab, arr)
+        stored = index["days"]
+
+    # Select the days from the cube
+    cube = None
+    if todo or not in_memory:
+        try:
+            cube = _open_prism_cube(index)
+        except FileNotFoundError:  # compacted by another process since we read the index
+            index = _read_prism_index()
+            stored = index["days"]
+            cube = _open_prism_cube(index)
+    for ymd in todo:
+        # Other days may still be upgraded, so they are checked against the index each time
+        if stored[ymd][1] == "stable":
+            MEMORY_CACHE.put(("prism", ymd, "ppt"), (cube[stored[ymd][0]], "stable"))
+    if not in_memory:
+        slots = np.array([stored[ymd][0] for ymd in ymds])
+        if len(slots) > 0 and (np.diff(slots) == 1).all():
+            ppt = cube[slots[0] : slots[-1] + 1]  # view
+        else:
+            ppt = cube[slots]
+    else:
+        ppt = np.stack(
+            [in_memory[ymd][0] if ymd in in_memory else cube[stored[ymd][0]] for ymd in ymds]
         )
-        dss_per_day.append(ds)
+    stability = [in_memory[ymd][1] if ymd in in_memory else stored[ymd][1] for ymd in ymds]
 
-    # Combined Dataset
-    ds = xr.concat(dss_per_day, dim="time")
-    ds["time"] = (("time",), pd.to_datetime(ymds))
+    # Construct Dataset
+    lon = _PRISM_ULXMAP + np.arange(_PRISM_NCOLS) * _PRISM_XDIM
+    lat = _PRISM_ULYMAP - np.arange(_PRISM_NROWS) * _PRISM_YDIM
+    ds = xr.Dataset(
+        data_vars={
+            "ppt": (
+                ("time", "lat", "lon"),
+                ppt,
+                {
+                    "long_name": "Precipitation",
+                    "units": "mm",
+                    "description": "Daily total precipitation (rain + melted snow)",
+                },
+            ),
+            "ppt_stability": (
+                ("time",),
+                stability,
+                {
+                    "long_name": "Stability",
+                    "description": (
+                        "'stable', 'provisional', or 'early', "
+                        "mostly depending on when the data was released"
+                    ),
+                },
+            ),
+        },
+        coords={
+            "time": (("time",), pd.to_datetime(ymds)),
+            "lat": (("lat",), lat),
+            "lon": (("lon",), lon),
+        },
+    )
 
     return ds
 
 
-def get_alexi(days, *, use_cache=True):
+ALEXI_RECHECK_DAYS = 7
+"""ALEXI ET availability checks done within this many days of the date are provisional
+(the file may still be posted), so `scan_alexi` re-checks them and `get_alexi` doesn't trust them."""
+
+_ALEXI_AVAILABILITY_LOCK = threading.Lock()
+
+
+def _alexi_availability_path() -> Path:
+    return CACHE_DIR / "alexi_availability.json"
+
+
+def _read_alexi_availability(base_url: str) -> dict[str, list]:
+    """Stored ALEXI ET file checks for `base_url`, ``{yj: [status, check timestamp]}``."""
+    try:
+        with open(_alexi_availability_path()) as f:
+            return json.load(f).get(base_url, {})
+    except (OSError, ValueError):
+        return {}
+
+
+def _update_alexi_availability(base_url: str, checks: dict[str, list]) -> None:
+    if not checks:
+        return
+    fp = _alexi_availability_path()
+    with _ALEXI_AVAILABILITY_LOCK, _file_lock(fp.with_suffix(".lock")):
+        # (re-read under the lock, so that updates by other processes are kept)
+        try:
+            with open(fp) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+        stored.setdefault(base_url, {}).update(checks)
+        tmp = _tmp_path(fp)
+        with open(tmp, "w") as f:
+            json.dump(stored, f)
+        os.replace(tmp, fp)
+
+
+def _alexi_check_settled(yj: str, checked: float) -> bool:
+    """Whether a check of date `yj` done at timestamp `checked` is final
+    (done after the `ALEXI_RECHECK_DAYS` window).
+    """
+    dt = datetime.datetime.fromtimestamp(checked) - datetime.datetime.strptime(yj, r"%Y%j")
+    return dt > datetime.timedelta(days=ALEXI_RECHECK_DAYS)
+
+
+def _alexi_known_missing(base_url: str) -> set[str]:
+    """Dates whose ALEXI ET file is known (settled check) to be missing (404)."""
+    return {
+        yj
+        for yj, (status, checked) in _read_alexi_availability(base_url).items()
+        if status == 404 and _alexi_check_settled(yj, checked)
+    }
+
+
+def _alexi_url(base_url: str, yj: str) -> str:
+    # e.g. https://geo.nsstc.nasa.gov/SPoRT/outgoing/crh/4ecostress/2022019/ALEXI_ET_4KM_CONUS_V01_2022019.dat
+    return f"{base_url}/{yj}/ALEXI_ET_4KM_CONUS_V01_{yj}.dat"
+
+
+def _head(url: str) -> requests.Response:
+    """HEAD `url` using the shared session for its host."""
+    with instrument.span("head", url=url):
+        r = _get_session(url).head(url, allow_redirects=True)
+        instrument.count("requests")
+
+    return r
+
+
+def _check_url(url: str):
+    """HEAD `url`, returning the status code (or the exception if the request failed)."""
+    try:
+        return _head(url).status_code
+    except requests.RequestException as e:
+        return e
+
+
+def scan_alexi(days=None, *, refresh=False, max_concurrency=None) -> pd.DataFrame:
+    """Check which ALEXI ET files are available on the server, with HEAD requests.
+
+    The results are stored in the cache directory, and dates with a settled check
+    (done more than `ALEXI_RECHECK_DAYS` after the date) are not re-checked
+    (unless `refresh`).
+    `get_alexi` skips downloading the dates known to be missing.
+
+    Parameters
+    ----------
+    days : array-like of datetime-like, optional
+        Default: the dates listed on the main page (current year).
+    refresh : bool
+        Re-check all dates.
+    max_concurrency : int, optional
+        Max number of requests in flight,
+        at most the connection pool size (32, the default).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Indexed by date, with columns
+        'status' (HTTP status code, NA if the request failed),
+        'ok' (file available), 'checked' (time of the check) and 'url'.
+    """
+    base_url = ALEXI_BASE_URL
+    if days is None:
+        yjs = sorted(_listing(f"{base_url}/", r">([0-9]{7})<"))
+    else:
+        yjs = list(pd.DatetimeIndex(days).strftime(r"%Y%j").unique())
+    if max_concurrency is None:
+        max_concurrency = _POOL_MAXSIZE
+    if max_concurrency < 1:
+        raise ValueError(f"`max_concurrency` must be at least 1, got {max_concurrency!r}")
+    # More would make the session discard connections instead of reusing them
+    max_concurrency = min(max_concurrency, _POOL_MAXSIZE)
+
+    stored = _read_alexi_availability(base_url)
+    todo = [
+        yj
+        for yj in yjs
+        if refresh or yj not in stored or not _alexi_check_settled(yj, stored[yj][1])
+    ]
+    checks = {}
+    failed = {}
+    if todo:
+        now = datetime.datetime.now().timestamp()
+        res = _map_threaded(
+            _check_url, [_alexi_url(base_url, yj) for yj in todo], max_workers=max_concurrency
+        )
+        for yj, status in zip(todo, res):
+            if isinstance(status, Exception) or not (status < 400 or status == 404):
+                failed[yj] = status
+            else:
+                checks[yj] = [status, now]
+        _update_alexi_availability(base_url, checks)
+    if failed:
+        warnings.warn(
+            f"ALEXI ET availability check failed for {len(failed)} dates: "
+            + ", ".join(f"{yj} ({x})" for yj, x in list(failed.items())[:5])
+            + (", ..." if len(failed) > 5 else ""),
+            stacklevel=2,
+        )
+
+    stored.update(checks)
+    status = [stored[yj][0] if yj in stored else None for yj in yjs]
+    checked = [stored[yj][1] if yj in stored else np.nan for yj in yjs]
+    df = pd.DataFrame(
+        {
+            "status": pd.array(status, dtype="Int64"),
+            "checked": pd.to_datetime(checked, unit="s"),
+            "url": [_alexi_url(base_url, yj) for yj in yjs],
+        },
+        index=pd.DatetimeIndex(pd.to_datetime(yjs, format=r"%Y%j"), name="date"),
+    )
+    df.insert(1, "ok", df.status < 400)
+
+    return df
+
+
+def _fill_index(present, method="nearest"):
+    """For each position in boolean array `present`,
+    get the positions of the present days to use and their weights.
+
+    Returns
+    -------
+    i0, i1 : array of int
+    w1 : array of float
+        The data at day ``i`` are ``(1 - w1) * x[i0] + w1 * x[i1]``.
+        For present days, ``i0 = i1 = i`` and ``w1 = 0``.
+    """
+    present = np.asarray(present, dtype=bool)
+    n = present.size
+    inds = np.arange(n)
+    (avail,) = np.nonzero(present)
+    if avail.size == 0:
+        raise ValueError("no present days to fill from")
+
+    # Previous and next present day (clipped at the edges)
+    j = np.searchsorted(avail, inds, side="right") - 1
+    k = np.searchsorted(avail, inds, side="left")
+    prev = avail[np.clip(j, 0, None)]
+    nxt = avail[np.clip(k, None, avail.size - 1)]
+    prev = np.where(j < 0, nxt, prev)
+    nxt = np.where(k >= avail.size, prev, nxt)
+
+    if method == "nearest":
+        use_next = (nxt - inds) < (inds - prev)
+        i0 = i1 = np.where(use_next, nxt, prev)
+        w1 = np.zeros(n)
+    elif method == "previous":
+        i0 = i1 = prev
+        w1 = np.zeros(n)
+    elif method == "linear":
+        i0, i1 = prev, nxt
+        span = i1 - i0
+        w1 = np.divide(inds - i0, span, out=np.zeros(n), where=span > 0)
+    else:
+        raise ValueError(f"invalid fill method {method!r}")
+
+    return i0, i1, w1
+
+
+def _alexi_available(days, *, archive=None) -> np.ndarray:
+    """Whether ALEXI ET is available for each of `days` (boolean array),
+    without loading it: in memory, in the archive (see `get_alexi`), in the cache directory,
+    or else on the server (checked with `scan_alexi`).
+    Days whose check failed (e.g. offline) are assumed available.
+    """
+    days = pd.DatetimeIndex(days)
+    base_url = ALEXI_BASE_URL
+
+    yjs = days.strftime(r"%Y%j")
+    if archive is None:
+        archive = ALEXI_ARCHIVE
+    archived = set()
+    if archive is not None:
+        from .archive import _archived_alexi_days
+
+        archived = _archived_alexi_days(archive, days)
+    available = np.array(
+        [
+            ("alexi", yj, "et") in MEMORY_CACHE
+            or yj in archived
+            or (CACHE_DIR / _alexi_url(base_url, yj).rsplit("/", 1)[-1]).is_file()
+            for yj in yjs
+        ],
+        dtype=bool,
+    )
+    if not available.all():
+        df = scan_alexi(days[~available])
+        ok = df.ok.fillna(True).to_numpy(dtype=bool)
+        available[~available] = ok[df.index.get_indexer(days[~available].floor("D"))]
+
+    return available
+
+
+def get_alexi(days, *, use_cache=True, lazy=False, fill="nearest", archive=None):
     """Get ALEXI data.
 
-    Only available for current year!
+    Only available for current year on the server!
+    Use `archive` for earlier years.
 
     Data: https://geo.nsstc.nasa.gov/SPoRT/outgoing/crh/4ecostress/
+
+    With `lazy`, the data are memory-mapped Dask arrays (see `load_alexi`),
+    one chunk per day, so that only the days accessed are read.
+
+    Cached days are loaded without contacting the server,
+    and dates known to be missing on the server (see `scan_alexi`) are not requested.
+
+    Parameters
+    ----------
+    archive : path-like, optional
+        Directory of yearly archives (``<year>.nc`` or ``<year>.zarr``,
+        see `swampy.archive.build_alexi_archive`).
+        Days in the archive are sliced from it (lazily with `lazy`),
+        and only the other days are downloaded.
+        Stores not in the current format raise ValueError (see `swampy.archive.read_alexi_archive`).
+        Default: `ALEXI_ARCHIVE`.
+    fill : {'nearest', 'previous', 'linear'} or None
+        How to fill days with missing ET files.
+        With 'nearest' and 'previous', the missing day reuses the data of another day.
+        If None, missing days are left NaN.
+        The ``et_filled`` variable in the result marks the filled days.
     """
     days = pd.DatetimeIndex(days)
 
-    base_url = "https://geo.nsstc.nasa.gov/SPoRT/outgoing/crh/4ecostress"
+    base_url = ALEXI_BASE_URL
 
     yjs = days.strftime(r"%Y%j").unique()
 
-    # Get available yjs from the main page
-    # e.g. `>2022001<`
-    url = f"{base_url}/"
-    r = requests.get(url)
-    r.raise_for_status()
-    available_yjs = re.findall(r">([0-9]{7})<", r.text)
-    if not available_yjs:
-        warnings.warn(
-            f"search of {base_url}/ detected no available dates for ALEXI ET", stacklevel=2
-        )
-
-    n_missing_days = 0
+    # Days in memory (not with `lazy`, which doesn't load the data)
+    in_memory = {}
+    if use_cache and not lazy:
+        for yj in yjs:
+            et = MEMORY_CACHE.get(("alexi", yj, "et"))
+            if et is not None:
+                in_memory[yj] = _alexi_ds(et, datetime.datetime.strptime(yj, r"%Y%j"))
+
+    # Days in the archive
+    if archive is None:
+        archive = ALEXI_ARCHIVE
+    if archive is not None:
+        from .archive import read_alexi_archive
+
+        todo = [yj for yj in yjs if yj not in in_memory]
+        for yj, et in read_alexi_archive(
+            archive, pd.to_datetime(todo, format=r"%Y%j"), lazy=lazy
+        ).items():
+            if not lazy:
+                et.flags.writeable = False
+                MEMORY_CACHE.put(("alexi", yj, "et"), et)
+            in_memory[yj] = _alexi_ds(et, datetime.datetime.strptime(yj, r"%Y%j"))
+
+    available_yjs = None
+    known_missing = None
     dss_per_yj = []
     for yj in yjs:
-        if yj not in available_yjs:
-            warnings.warn(
-                f"date {yj} not in detected ALEXI ET available dates {available_yjs}", stacklevel=2
-            )
+        if yj in in_memory:
+            dss_per_yj.append(in_memory[yj])
+            continue
 
-        # e.g. https://geo.nsstc.nasa.gov/SPoRT/outgoing/crh/4ecostress/2022019/ALEXI_ET_4KM_CONUS_V01_2022019.dat
-        fn = f"ALEXI_ET_4KM_CONUS_V01_{yj}.dat"
-        fp = CACHE_DIR / fn
+        url = _alexi_url(base_url, yj)
+        fp = CACHE_DIR / url.rsplit("/", 1)[-1]
 
         is_cached = fp.is_file()
         if not is_cached or not use_cache:
+            if use_cache:
+                if known_missing is None:
+                    known_missing = _alexi_known_missing(base_url)
+                if yj in known_missing:
+                    warnings.warn(
+                        f"ALEXI ET file {url} known to be missing (see `scan_alexi`)",
+                        stacklevel=2,
+                    )
+                    dss_per_yj.append(None)
+                    continue
+
+            if available_yjs is None or yj not in available_yjs:
+                # Get available yjs from the main page (listing cached, see `_listing`)
+                # e.g. `>2022001<`
+                available_yjs = _listing(
+                    f"{base_url}/", r">([0-9]{7})<", need=lambda items: yj in items
+                )
+                if not available_yjs:
+                    warnings.warn(
+                        f"search of {base_url}/ detected no available dates for ALEXI ET",
+                        stacklevel=2,
+                    )
+            if yj not in available_yjs:
+                warnings.warn(
+                    f"date {yj} not in detected ALEXI ET available dates {available_yjs}",
+                    stacklevel=2,
+                )
+
             # Download file (~ 3.5 MB)
-            url = f"{base_url}/{yj}/{fn}"
             print(url)
-            r = requests.get(url)
+            r = _get(url)
             if r.status_code == 404:
+                _update_alexi_availability(
+                    base_url, {yj: [404, datetime.datetime.now().timestamp()]}
+                )
                 warnings.warn(
                     f"ALEXI ET file {url} not found. Check {base_url}/{yj}/ to confirm.",
                     stacklevel=2,
@@ -307,58 +1381,74 @@ def get_alexi(days, *, use_cache=True):
                 # NOTE: sometimes dir for current day doesn't have the ET file yet
                 with open(fp, "wb") as f:
                     f.write(r.content)
+        else:
+            instrument.count("disk_cache_hits")
 
         if fp.is_file():
-            ds = load_alexi(fp)
+            with instrument.span("alexi.decode", lazy=lazy):
+                ds = load_alexi(fp, lazy=lazy)
+            if not lazy:
+                ds.et.values.flags.writeable = False
+                MEMORY_CACHE.put(("alexi", yj, "et"), ds.et.values)
         else:
-            ds = load_alexi(None)
-            n_missing_days += 1
+            ds = None
 
         dss_per_yj.append(ds)
 
+    # Fill missing days, selecting days (not interpolating along the stacked time dim)
+    present = np.array([ds is not None for ds in dss_per_yj])
+    if not present.any():
+        raise ValueError("all ALEXI ET data is NaN, won't interpolate")
+    if not present.all():
+        missing = [yj for yj, ok in zip(yjs, present) if not ok]
+        warnings.warn(
+            f"ALEXI ET missing for dates {missing}, filling with method {fill!r}", stacklevel=2
+        )
+        if fill is None:
+            ds_nan = xr.full_like(dss_per_yj[present.argmax()], np.nan)
+            dss_per_yj = [ds_nan if ds is None else ds for ds in dss_per_yj]
+        else:
+            i0, i1, w1 = _fill_index(present, fill)
+            dss_per_yj = [
+                dss_per_yj[a]
+                if w == 0
+                else dss_per_yj[a].assign(et=(1 - w) * dss_per_yj[a].et + w * dss_per_yj[b].et)
+                for a, b, w in zip(i0, i1, w1)
+            ]
+
     # Combined Dataset
     ds = xr.concat(dss_per_yj, dim="time")
     ds["time"] = (("time",), pd.to_datetime(yjs, format=r"%Y%j"))
-    if n_missing_days == len(yjs):
-        raise ValueError("all ALEXI ET data is NaN, won't interpolate")
-    if n_missing_days:
-        ds = ds.interpolate_na(dim="time", method="nearest")
-        # TODO: quite slow! better to find the nearest day another way and take its array before the concat
+    ds["et_filled"] = (
+        ("time",),
+        ~present if fill is not None else np.zeros(present.size, dtype=bool),
+        {
+            "long_name": "ET filled",
+            "description": "Whether the ET file was missing and the data filled from other days",
+            "fill_method": str(fill),
+        },
+    )
 
     return ds
 
 
-def load_alexi(fp: Path | None):
-    """Load an ALEXI ET file (binary), returning an xarray Dataset."""
+_ALEXI_NLAT = 625  # TODO: confirm the grid stuff!?
+_ALEXI_NLON = 1456
+_ALEXI_LLLAT = 24.80
+_ALEXI_LLLON = -125.0
+_ALEXI_DLAT = 0.04
+_ALEXI_DLON = 0.04
 
-    # Convert binary file to 2-D array
-    alexi_nlat = 625  # TODO: confirm the grid stuff!?
-    alexi_nlon = 1456
-    alexi_lllat = 24.80
-    alexi_lllon = -125.0
-    alexi_dlat = 0.04
-    alexi_dlon = 0.04
-    alexi_bad = -9999.0
-    if fp is None:
-        # No data -> all nan (but fill later!)
-        arr = np.full((alexi_nlat, alexi_nlon), np.nan, dtype=np.float32)
-        warnings.warn(f"setting ALEXI ET array to NaN since {fp.name} is missing", stacklevel=2)
-    else:
-        arr = np.fromfile(fp, dtype=np.float32)
-        arr = arr.reshape(alexi_nlat, alexi_nlon)
-        arr[arr == alexi_bad] = np.nan
-
-    # Get time from file path
-    t = datetime.datetime.strptime(fp.stem[-7:], r"%Y%j")
 
-    # Construct Dataset
-    lat = alexi_lllat + np.arange(alexi_nlat) * alexi_dlat
-    lon = alexi_lllon + np.arange(alexi_nlon) * alexi_dlon
+def _alexi_ds(et, t: datetime.datetime) -> xr.Dataset:
+    """Construct the ALEXI Dataset for ET array `et` (mm) at time `t`."""
+    lat = _ALEXI_LLLAT + np.arange(_ALEXI_NLAT) * _ALEXI_DLAT
+    lon = _ALEXI_LLLON + np.arange(_ALEXI_NLON) * _ALEXI_DLON
     ds = xr.Dataset(
         data_vars={
             "et": (
                 ("lat", "lon"),
-                0.408 * arr,  # MJ m-2 -> mm
+                et,  # MJ m-2 -> mm (x 0.408)
                 {
                     "long_name": "Evapotranspiration",
                     "units": "mm",
@@ -376,6 +1466,42 @@ def load_alexi(fp: Path | None):
     return ds
 
 
+def _decode_alexi(arr: np.ndarray) -> np.ndarray:
+    """Mask the bad values of raw ALEXI ET (float32, MJ m-2) and convert to mm, in place."""
+    arr[arr == -9999.0] = np.nan
+    np.multiply(arr, 0.408, out=arr)
+
+    return arr
+
+
+def load_alexi(fp: Path, *, lazy=False):
+    """Load an ALEXI ET file (binary), returning an xarray Dataset.
+
+    With `lazy`, the file is memory-mapped and wrapped in a Dask array,
+    so that the masking and unit conversion are only applied (and the data read)
+    when the values are needed.
+    """
+
+    # Convert binary file to 2-D array
+    alexi_nlat = _ALEXI_NLAT
+    alexi_nlon = _ALEXI_NLON
+    alexi_bad = -9999.0
+    if lazy:
+        import dask.array as da
+
+        arr = np.memmap(fp, dtype=np.float32, mode="r", shape=(alexi_nlat, alexi_nlon))
+        arr = da.from_array(arr, chunks=-1, name=f"alexi-{fp.name}")
+        et = 0.408 * da.where(arr == alexi_bad, np.nan, arr)
+    else:
+        arr = np.fromfile(fp, dtype=np.float32)
+        et = _decode_alexi(arr.reshape(alexi_nlat, alexi_nlon))
+
+    # Get time from file path
+    t = datetime.datetime.strptime(fp.stem[-7:], r"%Y%j")
+
+    return _alexi_ds(et, t)
+
+
 if __name__ == "__main__":
     import cartopy.crs as ccrs
     import matplotlib.pyplot as plt
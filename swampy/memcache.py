@@ -0,0 +1,130 @@
+"""
+In-memory cache of loaded data, shared by the loaders.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+from . import instrument
+
+
+def _nbytes(value) -> int:
+    """Approximate memory use of a cached value.
+
+    Memory-mapped arrays count in full too, since their pages stay resident once read.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    elif isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    elif isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    elif isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    else:
+        return 64
+
+
+class MemoryCache:
+    """Thread-safe least-recently-used cache with a memory budget.
+
+    Keys are tuples starting with the source name, e.g. ``("prism", "20220601", "ppt")``,
+    and hits and misses are counted per source.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Memory budget. Least recently used items are evicted to stay within it.
+        Set to 0 to disable caching.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = int(max_bytes)
+        self._items: OrderedDict = OrderedDict()  # key -> (value, nbytes)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._hits: dict[str, int] = {}
+        self._misses: dict[str, int] = {}
+        self._evictions = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int) -> None:
+        with self._lock:
+            self._max_bytes = int(value)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._items and self._nbytes > self._max_bytes:
+            _, (_, n) = self._items.popitem(last=False)
+            self._nbytes -= n
+            self._evictions += 1
+
+    def get(self, key, default=None):
+        """Get the value for `key` (marking it as recently used), counting the hit or miss."""
+        source = key[0]
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self._misses[source] = self._misses.get(source, 0) + 1
+            else:
+                self._items.move_to_end(key)
+                self._hits[source] = self._hits.get(source, 0) + 1
+        if item is None:
+            instrument.count("memory_cache_misses")
+            return default
+        instrument.count("memory_cache_hits")
+        return item[0]
+
+    def __contains__(self, key) -> bool:
+        """Whether `key` is cached (without counting a hit or miss or marking it as used)."""
+        with self._lock:
+            return key in self._items
+
+    def put(self, key, value) -> None:
+        """Store `value` for `key`, evicting least recently used items if over budget.
+        Values bigger than the budget are not stored.
+        """
+        n = _nbytes(value)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+            if n > self._max_bytes:
+                return
+            self._items[key] = (value, n)
+            self._nbytes += n
+            self._evict()
+
+    def clear(self) -> None:
+        """Remove all items and reset the statistics."""
+        with self._lock:
+            self._items.clear()
+            self._nbytes = 0
+            self._hits.clear()
+            self._misses.clear()
+            self._evictions = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counts (total and per source), evictions, and current size."""
+        with self._lock:
+            sources = sorted(set(self._hits) | set(self._misses))
+            return {
+                "hits": sum(self._hits.values()),
+                "misses": sum(self._misses.values()),
+                "evictions": self._evictions,
+                "items": len(self._items),
+                "nbytes": self._nbytes,
+                "max_bytes": self._max_bytes,
+                "sources": {
+                    s: {"hits": self._hits.get(s, 0), "misses": self._misses.get(s, 0)}
+                    for s in sources
+                },
+            }
@@ -0,0 +1,251 @@
+"""
+Write SWAMP output.
+"""
+from __future__ import annotations
+
+import math
+from pathlib import Path
+
+import numpy as np
+
+LAYOUTS = ("map", "timeseries")
+COMPRESSIONS = ("zlib", "zstd", None)
+
+_TILE = 32
+"""Spatial chunk size (each of the last two dims) for the time-series layout."""
+
+_TIME_CHUNK = 366
+"""Time chunk size for the time-series layout (max)."""
+
+
+def chunksizes(dims, shape, *, layout="map", dim="time", unlimited=False):
+    """Chunk shape for a variable with `dims` and `shape`.
+
+    - 'map': one `dim` step (e.g. day) and the full last two (spatial) dims per chunk,
+      for reading maps.
+    - 'timeseries': up to a year of `dim` steps and small spatial tiles per chunk,
+      for reading time series at points or regions.
+
+    Other dims (e.g. ensemble member) get chunk size 1.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"invalid layout {layout!r}. Valid: {LAYOUTS}")
+
+    spatial = set(dims[-2:])
+    res = []
+    for d, n in zip(dims, shape):
+        if d == dim:
+            if layout == "map":
+                c = 1
+            else:
+                c = _TIME_CHUNK if unlimited else min(n, _TIME_CHUNK)
+        elif d in spatial:
+            c = n if layout == "map" else min(n, _TILE)
+        else:
+            c = 1
+        res.append(max(c, 1))
+
+    return tuple(res)
+
+
+def _filter_kwargs(compression, complevel, shuffle):
+    """`netCDF4.Dataset.createVariable` compression settings."""
+    import netCDF4
+
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"invalid compression {compression!r}. Valid: {COMPRESSIONS}")
+    if compression is None:
+        return {}
+    if compression == "zstd" and not getattr(netCDF4, "__has_zstandard_support__", False):
+        raise ValueError("this netCDF4 installation doesn't support zstd compression")
+
+    return {"compression": compression, "complevel": complevel, "shuffle": shuffle}
+
+
+def bitround(a, keepbits):
+    """Round floating-point `a` to `keepbits` mantissa bits
+    (to nearest, ties away from zero, as netCDF-C's BitRound quantization does),
+    zeroing the rest so that it compresses better.
+    Non-finite values are unchanged.
+    """
+    a = np.asarray(a)
+    if a.dtype == np.float32:
+        uint, nmant = np.uint32, 23
+    elif a.dtype == np.float64:
+        uint, nmant = np.uint64, 52
+    else:
+        raise ValueError(f"bit rounding needs float32 or float64 data, got {a.dtype}")
+    if keepbits < 1:
+        raise ValueError(f"`keepbits` must be at least 1, got {keepbits!r}")
+    if keepbits >= nmant:
+        return a.copy()
+
+    maskbits = nmant - keepbits
+    b = a.view(uint)
+    half = uint(1 << (maskbits - 1))
+    mask = ~uint((1 << maskbits) - 1)
+    rounded = (b + half) & mask
+
+    return np.where(np.isfinite(a), rounded, b).view(a.dtype)
+
+
+def quantize(ds, significant_digits):
+    """Bit-round the floating-point data variables of `ds`
+    to keep `significant_digits` decimal digits (plain BitRound, see `bitround`).
+
+    Parameters
+    ----------
+    significant_digits : int or dict
+        For all float variables, or by variable name (variables not included are unchanged).
+        ``ceil(digits * log2(10))`` mantissa bits are kept (e.g. 5 digits -> 17 bits)
+        regardless of the values, so the relative error is at most ``2**-(nsb + 1)``.
+        This is not Granular BitRound, which picks the bits per value
+        and so keeps fewer of them (compressing more) for the same digits.
+    """
+    ds = ds.copy()
+    for name, da in ds.data_vars.items():
+        if isinstance(significant_digits, dict):
+            nsd = significant_digits.get(name)
+        else:
+            nsd = significant_digits
+        if nsd is None or da.dtype.kind != "f":
+            continue
+        nsb = math.ceil(nsd * math.log2(10))
+        ds[name] = da.copy(data=bitround(da.values, nsb))
+        ds[name].attrs.update(quantization_algorithm="bitround", quantization_nsb=nsb)
+
+    return ds
+
+
+def to_netcdf(
+    ds,
+    path,
+    *,
+    layout="map",
+    compression="zlib",
+    complevel=4,
+    shuffle=True,
+    significant_digits=None,
+    dim="time",
+    unlimited=False,
+    encoding=None,
+):
+    """Write `ds` (e.g. the result of `swampy.calc.run`) to netCDF-4 file `path`,
+    chunked for the `layout`, compressed, and optionally bit-rounded,
+    in one step (no temporary file or NCO needed).
+
+    Parameters
+    ----------
+    layout : {'map', 'timeseries'}
+        Chunk layout of the floating-point data variables with 2+ dims,
+        tuned for reading maps (one time step)
+        or time series (one point or small region). See `chunksizes`.
+    compression : {'zlib', 'zstd', None}
+        Compression filter for those variables, applied with `complevel` and `shuffle`.
+        Zstandard requires netCDF-C built with the filter plugins.
+    significant_digits : int or dict, optional
+        Bit-round the floating-point data variables (all, or by name) first,
+        keeping this many significant decimal digits. See `quantize`.
+    unlimited : bool
+        Make `dim` unlimited (for appending).
+    encoding : dict, optional
+        By variable name, `netCDF4.Dataset.createVariable` settings
+        (e.g. ``chunksizes``, ``complevel``) overriding the defaults.
+    """
+    import netCDF4
+
+    if significant_digits is not None:
+        ds = quantize(ds, significant_digits)
+    filters = _filter_kwargs(compression, complevel, shuffle)
+    encoding = encoding or {}
+
+    # xarray writes the rest (coordinates, attributes, other variables),
+    # but doesn't support all filters, so we create the main variables
+    big = [name for name, da in ds.data_vars.items() if da.ndim >= 2 and da.dtype.kind == "f"]
+    ds.drop_vars(big).to_netcdf(
+        path, format="NETCDF4", unlimited_dims=[dim] if unlimited and dim in ds.dims else None
+    )
+
+    with netCDF4.Dataset(path, "a") as nc:
+        for d, n in ds.sizes.items():
+            if d not in nc.dimensions:
+                nc.createDimension(d, None if unlimited and d == dim else n)
+        for name in big:
+            da = ds[name]
+            kwargs = dict(
+                filters,
+                chunksizes=chunksizes(
+                    da.dims, da.shape, layout=layout, dim=dim, unlimited=unlimited
+                ),
+            )
+            kwargs.update(encoding.get(name, {}))
+            v = nc.createVariable(name, da.dtype, da.dims, fill_value=np.nan, **kwargs)
+            attrs = dict(da.attrs)
+            coords = [
+                c
+                for c in ds.coords
+                if c not in ds.dims and ds[c].ndim > 0 and set(ds[c].dims) <= set(da.dims)
+            ]
+            if coords:
+                attrs["coordinates"] = " ".join(coords)
+            v.setncatts(attrs)
+            v.set_auto_mask(False)
+            # One step of `dim` at a time, to limit the memory use for lazy (Dask) data
+            if dim in da.dims:
+                i = da.dims.index(dim)
+                for k in range(da.shape[i]):
+                    key = (slice(None),) * i + (k,)
+                    v[key] = np.asarray(da.isel({dim: k}).values)
+            else:
+                v[:] = np.asarray(da.values)
+
+
+def to_netcdf_stream(datasets, path, *, dim="time", significant_digits=None, **kwargs):
+    """Write Datasets (e.g. the days yielded by `swampy.calc.iter_run`) to netCDF file `path`,
+    appending each along `dim` (unlimited) as it arrives.
+
+    Variables without `dim` are written from the first Dataset only.
+    `significant_digits` and `kwargs` (e.g. `layout`, `compression`) are as in `to_netcdf`.
+    Note that with the 'timeseries' layout, each append updates many chunks.
+
+    Returns
+    -------
+    int
+        Number of Datasets written.
+    """
+    import netCDF4
+
+    path = Path(path)
+    n = 0
+    nc = None
+    try:
+        for ds in datasets:
+            if significant_digits is not None:
+                ds = quantize(ds, significant_digits)
+            if nc is None:
+                # Let xarray set up the file (dims, attrs, encoding), then append to it
+                to_netcdf(ds, path, dim=dim, unlimited=True, **kwargs)
+                nc = netCDF4.Dataset(path, "a")
+                n = ds.sizes[dim]
+                continue
+
+            k = ds.sizes[dim]
+            sl = slice(n, n + k)
+            t = nc[dim]
+            t[sl] = netCDF4.date2num(
+                ds[dim].to_index().to_pydatetime(),
+                units=t.units,
+                calendar=getattr(t, "calendar", "standard"),
+            )
+            for name, da in ds.data_vars.items():
+                if dim not in da.dims:
+                    continue
+                v = nc[name]
+                key = tuple(sl if d == dim else slice(None) for d in v.dimensions)
+                v[key] = np.asarray(da.transpose(*v.dimensions).values)
+            n += k
+    finally:
+        if nc is not None:
+            nc.close()
+
+    return n
@@ -0,0 +1,318 @@
+"""
+Regrid inputs to the SWAMP grid using sparse weight matrices,
+computed once per (source grid, target grid, method) and cached on disk.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import xarray as xr
+
+METHODS = ("bilinear", "nearest", "conservative")
+
+POINT_METHODS = ("bilinear", "nearest")
+"""Methods for `get_point_weights`."""
+
+_WEIGHTS: dict = {}
+"""In-memory cache of weights, by key (see `_weights_key`)."""
+
+
+def _edges(c):
+    """Cell edges for increasing, regularly spaced (or nearly) centers `c`."""
+    mid = (c[:-1] + c[1:]) / 2
+    return np.concatenate([[c[0] - (mid[0] - c[0])], mid, [c[-1] + (c[-1] - mid[-1])]])
+
+
+def _weights_1d(src, dst, method):
+    """Sparse weights (dst x src) for regridding along one dimension.
+
+    Target points outside the source range get no weights.
+    """
+    from scipy import sparse
+
+    src = np.asarray(src, dtype=float)
+    dst = np.asarray(dst, dtype=float)
+    nsrc = src.size
+
+    # Work with increasing source coordinates
+    isort = np.argsort(src)
+    s = src[isort]
+
+    rows, cols, vals = [], [], []
+    if method == "bilinear":
+        inside = (dst >= s[0]) & (dst <= s[-1])
+        (i,) = np.nonzero(inside)
+        j = np.clip(np.searchsorted(s, dst[i], side="right") - 1, 0, nsrc - 2)
+        w1 = (dst[i] - s[j]) / (s[j + 1] - s[j])
+        rows = np.concatenate([i, i])
+        cols = np.concatenate([j, j + 1])
+        vals = np.concatenate([1 - w1, w1])
+    elif method == "nearest":
+        inside = (dst >= s[0]) & (dst <= s[-1])
+        (i,) = np.nonzero(inside)
+        j = np.clip(np.searchsorted(s, dst[i]), 1, nsrc - 1)
+        j = np.where(dst[i] - s[j - 1] <= s[j] - dst[i], j - 1, j)
+        rows, cols, vals = i, j, np.ones(i.size)
+    elif method == "conservative":
+        se = _edges(s)
+        de = _edges(dst)
+        for i in range(dst.size):
+            lo, hi = de[i], de[i + 1]
+            j0 = max(np.searchsorted(se, lo, side="right") - 1, 0)
+            j1 = min(np.searchsorted(se, hi, side="left"), nsrc)
+            for j in range(j0, j1):
+                overlap = min(hi, se[j + 1]) - max(lo, se[j])
+                if overlap > 0:
+                    rows.append(i)
+                    cols.append(j)
+                    vals.append(overlap / (hi - lo))
+    else:
+        raise ValueError(f"invalid regrid method {method!r}. Valid: {METHODS}")
+
+    w = sparse.csr_matrix(
+        (vals, (rows, isort[np.asarray(cols, dtype=int)])), shape=(dst.size, nsrc)
+    )
+    w.eliminate_zeros()
+
+    return w
+
+
+def _weights_key(src_lat, src_lon, dst_lat, dst_lon, method):
+    h = hashlib.sha1(method.encode())
+    for a in (src_lat, src_lon, dst_lat, dst_lon):
+        a = np.ascontiguousarray(a, dtype=np.float64)
+        h.update(str(a.shape).encode())
+        h.update(a.tobytes())
+    return f"{method}_{h.hexdigest()[:16]}"
+
+
+def get_weights(src_lat, src_lon, dst_lat, dst_lon, method="bilinear"):
+    """Get the sparse regridding weights, computing them if not cached.
+
+    Returns
+    -------
+    w : scipy.sparse.csr_matrix
+        Shape (ndst, nsrc), where the flattened grids are lat-major (C order).
+    """
+    from scipy import sparse
+
+    from .load import CACHE_DIR
+
+    key = _weights_key(src_lat, src_lon, dst_lat, dst_lon, method)
+    w = _WEIGHTS.get(key)
+    if w is not None:
+        return w
+
+    fp = CACHE_DIR / f"regrid_{key}.npz"
+    w = None
+    if fp.is_file():
+        try:
+            w = sparse.load_npz(fp).tocsr()
+        except (OSError, ValueError, zipfile.BadZipFile):  # e.g. truncated by an older version
+            pass
+    if w is None:
+        w_lat = _weights_1d(src_lat, dst_lat, method)
+        w_lon = _weights_1d(src_lon, dst_lon, method)
+        w = sparse.kron(w_lat, w_lon, format="csr")
+        # Write to a unique temporary file first, so that a partial file is never seen
+        tmp = fp.with_name(f".{fp.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp, "wb") as f:  # (`save_npz` would append ``.npz`` to other names)
+                sparse.save_npz(f, w)
+            os.replace(tmp, fp)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    _WEIGHTS[key] = w
+
+    return w
+
+
+def get_point_weights(src_lat, src_lon, lat, lon, method="nearest"):
+    """Get the sparse weights for interpolating from a grid to points (`lat`, `lon`),
+    e.g. the grid cell containing each point ('nearest') or the 2x2 stencil around it ('bilinear').
+    Cached in memory.
+
+    Returns
+    -------
+    w : scipy.sparse.csr_matrix
+        Shape (npoint, nsrc), where the flattened source grid is lat-major (C order).
+        Points outside the grid get no weights.
+    """
+    from scipy import sparse
+
+    if method not in POINT_METHODS:
+        raise ValueError(f"invalid point interpolation method {method!r}. Valid: {POINT_METHODS}")
+
+    key = "points_" + _weights_key(src_lat, src_lon, lat, lon, method)
+    w = _WEIGHTS.get(key)
+    if w is not None:
+        return w
+
+    # Row-wise Kronecker product of the 1-D weights
+    w_lat = _weights_1d(src_lat, lat, method)
+    w_lon = _weights_1d(src_lon, lon, method)
+    nlon = w_lon.shape[1]
+    rows, cols, vals = [], [], []
+    for i in range(w_lat.shape[0]):
+        a = slice(w_lat.indptr[i], w_lat.indptr[i + 1])
+        b = slice(w_lon.indptr[i], w_lon.indptr[i + 1])
+        j = w_lat.indices[a][:, np.newaxis] * nlon + w_lon.indices[b]
+        rows.append(np.full(j.size, i))
+        cols.append(j.ravel())
+        vals.append(np.outer(w_lat.data[a], w_lon.data[b]).ravel())
+    w = sparse.csr_matrix(
+        (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(w_lat.shape[0], w_lat.shape[1] * nlon),
+    )
+
+    _WEIGHTS[key] = w
+
+    return w
+
+
+def _matmul(w, x, valid=None):
+    """``w @ x``, or, with `valid` (conservative; `x` with NaNs zeroed),
+    the weighted average of the valid `x` (NaN where none).
+    """
+    if valid is None:
+        return w @ x
+
+    num = w @ x
+    den = w @ valid
+    return np.divide(num, den, out=np.full(num.shape, np.nan), where=den > 0)
+
+
+def _out_of_range(w):
+    """Targets (rows of weights `w`) with no source cells."""
+    return np.asarray(w.sum(axis=1)).ravel() == 0
+
+
+def _apply_weights(x, w, out_of_range, *, out_shape, conservative=False, blocks=None):
+    """Apply the weights `w` (target, source) to the trailing (lat, lon) dims of array `x`,
+    giving trailing dims `out_shape`, with NaN at the targets `out_of_range` (boolean).
+
+    `blocks`, pairs of rows of `w` and the target slice they cover,
+    are computed in parallel threads.
+    """
+    nsrc = w.shape[1]
+    if blocks is None:
+        blocks = [(w, slice(None))]
+
+    lead = x.shape[:-2]
+    x = x.reshape(-1, nsrc).T
+    valid = None
+    if conservative:
+        isnan = np.isnan(x)
+        x = np.where(isnan, 0, x)
+        valid = (~isnan).astype(np.float64)
+    y = np.empty((w.shape[0], x.shape[1]))
+
+    def f(block):
+        w_, sl = block
+        y[sl] = _matmul(w_, x, valid)
+
+    if len(blocks) == 1:
+        f(blocks[0])
+    else:
+        with ThreadPoolExecutor(max_workers=len(blocks)) as pool:
+            for _ in pool.map(f, blocks):
+                pass
+
+    y[out_of_range] = np.nan
+    return y.T.reshape(*lead, *out_shape)
+
+
+def regrid(da, lat, lon, *, method="bilinear", n_workers=None):
+    """Regrid `da` (with dims including 'lat' and 'lon') to the grid `lat`, `lon`.
+
+    The weights are applied as a single sparse matrix product
+    over all other dimensions (e.g. time) at once,
+    or per chunk if `da` is a Dask array.
+
+    Parameters
+    ----------
+    method : {'bilinear', 'nearest', 'conservative'}
+        With 'bilinear' and 'nearest', the result is NaN where any contributing source
+        cell is NaN (like `xarray.DataArray.interp`).
+        With 'conservative' (area-weighted average of overlapping source cells),
+        NaN source cells are excluded and the weights renormalized.
+    n_workers : int, optional
+        Compute blocks of target rows (latitude tiles) in this many parallel threads.
+        Default: serial.
+    """
+    coords = {"lat": lat, "lon": lon}
+    lat = np.asarray(lat)
+    lon = np.asarray(lon)
+    w = get_weights(da.lat.values, da.lon.values, lat, lon, method)
+    out_of_range = _out_of_range(w)
+
+    if n_workers is not None and n_workers > 1:
+        # Blocks of whole target lat rows
+        bounds = np.linspace(0, lat.size, n_workers + 1).astype(int) * lon.size
+        blocks = [(w[a:b], slice(a, b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    else:
+        blocks = [(w, slice(None))]
+
+    def apply(x):
+        return _apply_weights(
+            x,
+            w,
+            out_of_range,
+            out_shape=(lat.size, lon.size),
+            conservative=method == "conservative",
+            blocks=blocks,
+        )
+
+    res = xr.apply_ufunc(
+        apply,
+        da,
+        input_core_dims=[["lat", "lon"]],
+        output_core_dims=[["lat", "lon"]],
+        exclude_dims={"lat", "lon"},
+        dask="parallelized",
+        output_dtypes=[np.float64],
+        dask_gufunc_kwargs={"output_sizes": {"lat": lat.size, "lon": lon.size}},
+        keep_attrs=True,
+    )
+    res = res.assign_coords(coords)
+
+    return res
+
+
+def regrid_cells(da, lat, lon, cells, *, method="bilinear"):
+    """Like `regrid`, but only computing the target grid `cells`
+    (indices into the flattened, lat-major grid `lat`, `lon`),
+    using just those rows of the weights.
+
+    Returns
+    -------
+    xarray.DataArray
+        With dim 'cell' in place of 'lat' and 'lon'.
+    """
+    cells = np.asarray(cells)
+    w = get_weights(da.lat.values, da.lon.values, np.asarray(lat), np.asarray(lon), method)[cells]
+    out_of_range = _out_of_range(w)
+
+    def apply(x):
+        return _apply_weights(
+            x, w, out_of_range, out_shape=(cells.size,), conservative=method == "conservative"
+        )
+
+    return xr.apply_ufunc(
+        apply,
+        da,
+        input_core_dims=[["lat", "lon"]],
+        output_core_dims=[["cell"]],
+        exclude_dims={"lat", "lon"},
+        dask="parallelized",
+        output_dtypes=[np.float64],
+        dask_gufunc_kwargs={"output_sizes": {"cell": cells.size}},
+        keep_attrs=True,
+    )
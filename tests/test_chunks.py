@@ -0,0 +1,100 @@
+"""
+Results loaded in chunks (`run` with `prefetch`, `iter_run`, `run_points`)
+must match those of `run` loading all days at once,
+also with missing ALEXI ET days next to chunk edges and a chunk with none.
+"""
+import sys
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "benchmarks"))
+from standin import quiet, standin_server
+
+from swampy import calc, load
+
+DAYS = pd.date_range("2021-06-01", periods=16)
+CHUNK_DAYS = 4
+
+# Positions in `DAYS[1:]` (the days with inputs), so chunks are [0, 4), [4, 8), [8, 12), [12, 15)
+MISSING_ALEXI = [2, 3, 8, 9, 10, 11]
+"""The end of the first chunk, and the whole third chunk."""
+
+
+@pytest.fixture(scope="module")
+def standin(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("swampy")
+
+    # Synthetic coefficients
+    rng = np.random.default_rng(0)
+    c1 = rng.uniform(0.05, 0.5, (calc._NLAT, calc._NLON))
+    calc._save_coeffs_npy(tmp / "coeffs", np.zeros_like(c1), c1, {})
+    coeffs_dir = calc._COEFFS_DIR
+    calc.use_coeffs(tmp / "coeffs")
+
+    cache_dir = load.CACHE_DIR
+    load.CACHE_DIR = tmp / "cache"
+    load.CACHE_DIR.mkdir()
+    try:
+        with standin_server(tmp / "server", DAYS, nstation=2):
+            for d in DAYS[1:][MISSING_ALEXI]:
+                yj = d.strftime(r"%Y%j")
+                (tmp / "server" / "alexi" / yj / f"ALEXI_ET_4KM_CONUS_V01_{yj}.dat").unlink()
+            yield
+    finally:
+        load.CACHE_DIR = cache_dir
+        load.MEMORY_CACHE.clear()
+        calc.use_coeffs(coeffs_dir)
+
+
+def _run(func, *args, **kwargs):
+    load.MEMORY_CACHE.clear()
+    with quiet(), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return func(DAYS[0], DAYS[-1], *args, quiet=True, **kwargs)
+
+
+@pytest.fixture(scope="module")
+def ref(standin):
+    return _run(calc.run)
+
+
+@pytest.mark.parametrize("prefetch", [1, 2])
+def test_run_prefetch(ref, prefetch):
+    ds = _run(calc.run, prefetch=prefetch, chunk_days=CHUNK_DAYS)
+    np.testing.assert_array_equal(ds.sm.values, ref.sm.values)
+    np.testing.assert_array_equal(ds.smn.values, ref.smn.values)
+
+
+@pytest.mark.parametrize("prefetch", [0, 1])
+def test_iter_run(ref, prefetch):
+    dss = _run(
+        lambda *args, **kwargs: list(calc.iter_run(*args, **kwargs)),
+        prefetch=prefetch,
+        chunk_days=CHUNK_DAYS,
+    )
+    assert [ds.time.values[0] for ds in dss] == list(ref.time.values)
+    np.testing.assert_array_equal(np.concatenate([ds.sm.values for ds in dss]), ref.sm.values)
+    np.testing.assert_array_equal(np.concatenate([ds.smn.values for ds in dss]), ref.smn.values)
+
+
+def test_run_points(ref):
+    from swampy.regrid import get_point_weights
+
+    grid = calc._get_grid()
+    points = pd.DataFrame(
+        {
+            "lat": grid.lat.values[[100, 300, 500, 650]],
+            "lon": grid.lon.values[[200, 600, 900, 1100]],
+        },
+        index=["a", "b", "c", "d"],
+    )
+    ds = _run(calc.run_points, points, chunk_days=CHUNK_DAYS)
+
+    w = get_point_weights(grid.lat.values, grid.lon.values, points.lat, points.lon, "nearest")
+    for v in ["sm", "smn"]:
+        expected = (w @ ref[v].values.reshape(len(DAYS), -1).T).T
+        np.testing.assert_array_equal(ds[v].values, expected)